@@ -0,0 +1,245 @@
+import collections
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+import snapshots
+from scheduler import QuotaExceeded, PRIORITY_BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+ANSWER_CACHE_TTL = float(os.environ.get('ANSWER_CACHE_TTL', 3600))
+ANSWER_CACHE_SIZE = int(os.environ.get('ANSWER_CACHE_SIZE', 5000))
+QUESTION_LOG = os.environ.get('QUESTION_LOG', os.path.join(snapshots.DATASET_DIR, '.questions.jsonl'))
+WARMUP_ENABLED = os.environ.get('WARMUP_ENABLED', '1') == '1'
+WARMUP_QUESTIONS = int(os.environ.get('WARMUP_QUESTIONS', 20))
+# Entries with at least this many hits are recomputed before they expire
+REFRESH_MIN_HITS = int(os.environ.get('REFRESH_MIN_HITS', 3))
+REFRESH_INTERVAL = float(os.environ.get('REFRESH_INTERVAL', 60))
+# The log is rotated past this size; the current and the one previous file are all that is kept
+QUESTION_LOG_MAX_BYTES = int(os.environ.get('QUESTION_LOG_MAX_BYTES', 5 * 1024 * 1024))
+
+
+def normalize_question(question):
+    return re.sub(r'\s+', ' ', question.strip().lower()).rstrip('?!. ')
+
+
+class AnswerCache:
+    """TTL + LRU cache of chat answers keyed by tenant, dataset version, mode and question"""
+
+    def __init__(self, ttl=ANSWER_CACHE_TTL, max_entries=ANSWER_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'refreshed': 0}
+
+    @staticmethod
+    def key(tenant_id, version, mode, question):
+        return (tenant_id, version, mode, normalize_question(question))
+
+    def get(self, tenant_id, version, mode, question):
+        key = self.key(tenant_id, version, mode, question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry['expires'] < time.monotonic():
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            entry['hits'] += 1
+            self._stats['hits'] += 1
+            return entry['value']
+
+    def put(self, tenant_id, version, mode, question, value, refreshed=False):
+        key = self.key(tenant_id, version, mode, question)
+        with self._lock:
+            # Hits count within one TTL window, so an entry is only refreshed again if it stays popular
+            self._entries[key] = {
+                'question': question,
+                'value': value,
+                'expires': time.monotonic() + self.ttl,
+                'hits': 0,
+            }
+            self._entries.move_to_end(key)
+            if refreshed:
+                self._stats['refreshed'] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def contains(self, tenant_id, version, mode, question):
+        key = self.key(tenant_id, version, mode, question)
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry['expires'] >= time.monotonic()
+
+    def drop_tenant(self, tenant_id):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == tenant_id]:
+                del self._entries[key]
+
+    def expiring(self, within, min_hits):
+        """Popular entries that expire within `within` seconds: [(tenant, version, mode, question)]"""
+        deadline = time.monotonic() + within
+        with self._lock:
+            return [(key[0], key[1], key[2], entry['question'])
+                    for key, entry in self._entries.items()
+                    if entry['hits'] >= min_hits and entry['expires'] <= deadline]
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), ttl=self.ttl)
+
+
+class QuestionLog:
+    """
+    JSON lines log of the questions users ask, used to pick what to warm. Once
+    the file passes `max_bytes` it is moved to `<path>.1` (replacing the
+    previous one), so at most about twice `max_bytes` of recent questions are
+    kept and read.
+    """
+
+    def __init__(self, path=QUESTION_LOG, max_bytes=QUESTION_LOG_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def record(self, tenant_id, question, mode):
+        line = json.dumps({'ts': time.time(), 'tenant': tenant_id, 'mode': mode, 'question': question})
+        try:
+            with self._lock:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(line + "\n")
+                    size = f.tell()
+                if size > self.max_bytes:
+                    os.replace(self.path, self.path + '.1')
+        except OSError as e:
+            logger.warning(f"Could not write question log: {str(e)}")
+
+    def _lines(self):
+        for path in (self.path + '.1', self.path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    yield from f
+            except FileNotFoundError:
+                continue
+
+    def top(self, tenant_id, limit):
+        """Most frequently asked (question, mode) pairs for a tenant"""
+        counts = collections.Counter()
+        latest = {}
+        for line in self._lines():
+            try:
+                item = json.loads(line)
+            except ValueError:
+                continue
+            if item.get('tenant') != tenant_id or not item.get('question'):
+                continue
+            key = (normalize_question(item['question']), item.get('mode'))
+            counts[key] += 1
+            latest[key] = item['question']
+        return [(latest[key], key[1]) for key, _ in counts.most_common(limit)]
+
+
+class CacheWarmer:
+    """
+    Pre-populates the answer cache from the question log and keeps popular
+    entries fresh. `compute(question, snapshot, mode, priority)` must return the
+    response dict for a question, and `prepare(snapshot)` builds the per-version
+    indexes so the first real request does not pay for them.
+    """
+
+    def __init__(self, cache, log, registry, compute, prepare=None):
+        self.cache = cache
+        self.log = log
+        self.registry = registry
+        self.compute = compute
+        self.prepare = prepare
+        self.ready = threading.Event()
+        self._warmed = set()
+        self._thread = None
+        self._stats = {'warmed': 0, 'warm_runs': 0, 'errors': 0}
+
+    def _answer(self, tenant, snapshot, question, mode, refreshed=False):
+        value = self.compute(question, snapshot, mode, PRIORITY_BACKGROUND)
+        self.cache.put(tenant.id, snapshot.version, mode, question, value, refreshed=refreshed)
+
+    def warm(self, tenant):
+        """Build the tenant's indexes and answer its most frequent questions for the current version"""
+        # Not tenant.snapshot(): background work should not keep an idle tenant from being evicted
+        snapshot = tenant.store.current()
+        if (tenant.id, snapshot.version) in self._warmed:
+            return
+        started = time.monotonic()
+        if self.prepare is not None:
+            self.prepare(snapshot)
+        warmed = 0
+        for question, mode in self.log.top(tenant.id, WARMUP_QUESTIONS):
+            if self.cache.contains(tenant.id, snapshot.version, mode, question):
+                continue
+            try:
+                self._answer(tenant, snapshot, question, mode)
+                warmed += 1
+            except QuotaExceeded:
+                logger.info("LLM quota reached, stopping warmup early")
+                break
+            except Exception as e:
+                self._stats['errors'] += 1
+                logger.warning(f"Warmup failed for {question!r}: {str(e)}")
+        self._warmed.add((tenant.id, snapshot.version))
+        self._stats['warmed'] += warmed
+        self._stats['warm_runs'] += 1
+        logger.info(f"Warmed {warmed} answers for tenant {tenant.id} version {snapshot.version} "
+                    f"in {time.monotonic() - started:.1f}s")
+
+    def refresh_expiring(self):
+        """Recompute popular entries before their TTL runs out, so hot questions never miss"""
+        for tenant_id, version, mode, question in self.cache.expiring(REFRESH_INTERVAL * 2, REFRESH_MIN_HITS):
+            tenant = next((t for t in self.registry.loaded() if t.id == tenant_id), None)
+            if tenant is None:
+                continue
+            snapshot = tenant.store.current()
+            if snapshot.version != version:
+                # Old dataset version; warm() covers the new one
+                continue
+            try:
+                self._answer(tenant, snapshot, question, mode, refreshed=True)
+            except QuotaExceeded:
+                logger.info("LLM quota reached, postponing cache refresh")
+                return
+            except Exception as e:
+                self._stats['errors'] += 1
+                logger.warning(f"Refresh failed for {question!r}: {str(e)}")
+
+    def _run(self):
+        try:
+            self.warm(self.registry.get())
+        except Exception as e:
+            logger.error(f"Warmup failed: {str(e)}", exc_info=True)
+        finally:
+            self.ready.set()
+        while True:
+            time.sleep(REFRESH_INTERVAL)
+            try:
+                for tenant in self.registry.loaded():
+                    self.warm(tenant)
+                self.refresh_expiring()
+            except Exception as e:
+                logger.error(f"Background cache refresh failed: {str(e)}", exc_info=True)
+
+    def start(self):
+        if not WARMUP_ENABLED:
+            self.ready.set()
+            return
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='cache-warmer', daemon=True)
+            self._thread.start()
+
+    def stats(self):
+        return dict(self._stats, ready=self.ready.is_set(), cache=self.cache.stats())
+
+
+answer_cache = AnswerCache()
+question_log = QuestionLog()
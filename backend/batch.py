@@ -0,0 +1,135 @@
+import json
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from dataset import dataset_prompt, chat_prompt, local_answerer, PLAIN_TEXT_INSTRUCTION
+from llm import generate
+from scheduler import estimate_tokens, QuotaExceeded, PRIORITY_BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+# Budgets for one packed upstream call
+BATCH_INPUT_TOKENS = int(os.environ.get('BATCH_INPUT_TOKENS', 200000))
+BATCH_OUTPUT_TOKENS = int(os.environ.get('BATCH_OUTPUT_TOKENS', 8000))
+ANSWER_TOKENS = 400  # output allowance per question
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', 4))
+MAX_BATCH_QUESTIONS = 200
+
+
+def batch_prompt(items, snapshot=None):
+    """One prompt answering several questions over a single copy of the dataset"""
+    numbered = "\n".join(f"{index}. {question}" for index, question in items)
+    return f"""You are an AI assistant analyzing a csv dataset of CRM data.
+    Answer each of the numbered questions below in English, clearly and in detail.
+    Answer every question on its own, do not refer to the other questions.
+
+    Questions:
+{numbered}
+
+    The dataset is as follows:
+{dataset_prompt(snapshot)}
+{PLAIN_TEXT_INSTRUCTION}
+Return a JSON array with one object per question: {{"id": <question number>, "answer": "<answer text>"}}
+"""
+
+
+def pack_questions(items, snapshot=None):
+    """Greedily group (index, question) pairs into as few prompts as the token budgets allow"""
+    base_tokens = estimate_tokens(batch_prompt([], snapshot), expected_output=0)
+    groups, group, group_tokens = [], [], base_tokens
+    for item in items:
+        tokens = estimate_tokens(item[1], expected_output=0) + 8
+        too_big = group_tokens + tokens > BATCH_INPUT_TOKENS
+        too_long = (len(group) + 1) * ANSWER_TOKENS > BATCH_OUTPUT_TOKENS
+        if group and (too_big or too_long):
+            groups.append(group)
+            group, group_tokens = [], base_tokens
+        group.append(item)
+        group_tokens += tokens
+    if group:
+        groups.append(group)
+    return groups
+
+
+def parse_batch_answers(text):
+    """Map question number -> answer from the model's JSON reply, ignoring anything malformed"""
+    # The model sometimes wraps the JSON in a ```json fence
+    text = re.sub(r'^```(?:json)?\s*|\s*```$', '', text.strip())
+    try:
+        items = json.loads(text)
+    except ValueError:
+        logger.warning("Could not parse batch answer as JSON")
+        return {}
+    answers = {}
+    for item in items if isinstance(items, list) else []:
+        if isinstance(item, dict) and isinstance(item.get('answer'), str):
+            try:
+                answers[int(item.get('id'))] = item['answer']
+            except (TypeError, ValueError):
+                continue
+    return answers
+
+
+def _answer_group(group, snapshot, priority):
+    if len(group) == 1:
+        return {group[0][0]: generate(chat_prompt(group[0][1], snapshot), priority=priority)}
+    prompt = batch_prompt(group, snapshot)
+    text = generate(prompt, priority=priority,
+                    generation_config={'response_mime_type': 'application/json'},
+                    expected_output=len(group) * ANSWER_TOKENS)
+    return parse_batch_answers(text)
+
+
+def answer_batch(questions, snapshot, priority=PRIORITY_BACKGROUND):
+    """
+    Answer a list of questions, yielding one result dict per question as soon as it is ready.
+
+    Questions the local dataset can answer are returned first. The rest are packed
+    into shared-context prompts that run concurrently; anything a packed reply
+    misses is retried on its own.
+    """
+    answerer = local_answerer(snapshot)
+    remote = []
+    for index, question in enumerate(questions):
+        answer = answerer.answer(question)
+        if answer is not None:
+            yield {'index': index, 'question': question, 'answer': answer, 'source': 'local'}
+        else:
+            remote.append((index, question))
+
+    if not remote:
+        return
+
+    groups = pack_questions(remote, snapshot)
+    logger.debug(f"Batch: {len(questions) - len(remote)} local, {len(remote)} remote in {len(groups)} calls")
+
+    executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS)
+    try:
+        pending = {executor.submit(_answer_group, group, snapshot, priority): group for group in groups}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                group = pending.pop(future)
+                try:
+                    answers = future.result()
+                except QuotaExceeded as e:
+                    for index, question in group:
+                        yield {'index': index, 'question': question, 'error': str(e), 'retry_after': e.retry_after}
+                    continue
+                except Exception as e:
+                    logger.error(f"Error answering batch group: {str(e)}", exc_info=True)
+                    answers = {}
+
+                source = 'batch' if len(group) > 1 else 'single'
+                for index, question in group:
+                    if index in answers:
+                        yield {'index': index, 'question': question, 'answer': answers[index], 'source': source}
+                    elif len(group) > 1:
+                        # Fan out whatever the packed call did not answer
+                        pending[executor.submit(_answer_group, [(index, question)], snapshot, priority)] = [(index, question)]
+                    else:
+                        yield {'index': index, 'question': question, 'error': "An error occurred while answering"}
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,31 @@
+import snapshots
+from local_answers import LocalAnswerer
+
+# The CRM tables live as csv files in the data directory (see snapshots.py).
+# Pass the snapshot a request started with, so a reload halfway through does not mix versions.
+
+PLAIN_TEXT_INSTRUCTION = "In the answer text just give me plain text without double asterisks to highlight some text in bold style. I do not need that!!!"
+
+
+def dataset_prompt(snapshot=None, tables=None):
+    """The tables (all of them by default) as fenced csv blocks, the way they are given to Gemini"""
+    snapshot = snapshot or snapshots.current()
+    return "\n\n".join(f"```{name}.csv\n{table.text}```" for name, table in snapshot.tables.items()
+                       if tables is None or name in tables)
+
+
+def local_answerer(snapshot=None):
+    """LocalAnswerer for the snapshot, built once per dataset version"""
+    snapshot = snapshot or snapshots.current()
+    return snapshot.derive('local_answerer', lambda s: LocalAnswerer(s.rows()))
+
+
+def chat_prompt(user_question, snapshot=None, tables=None):
+    """Prompt used to answer a single chat question over the dataset (or only some of its tables)"""
+    return f"""You are an AI assistant analyzing a csv dataset of CRM data.
+    Provide a clear and detailed answer in English to the following question: "{user_question}"
+
+    The dataset is as follows:
+{dataset_prompt(snapshot, tables)}
+{PLAIN_TEXT_INSTRUCTION}
+"""
@@ -0,0 +1,203 @@
+import collections
+import hmac
+import linecache
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+from flask import Response, jsonify, request
+
+logger = logging.getLogger(__name__)
+
+# The debug routes only exist when this is set; every request must send it as X-Debug-Token
+DEBUG_TOKEN = os.environ.get('DEBUG_TOKEN', '')
+PROFILE_MAX_SECONDS = float(os.environ.get('DEBUG_PROFILE_MAX_SECONDS', 60))
+TRACEMALLOC_FRAMES = int(os.environ.get('DEBUG_TRACEMALLOC_FRAMES', 10))
+
+# Allocations made by the tracing itself (and formatting its tracebacks) or by imports are noise
+TRACE_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, linecache.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+]
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    # ';' separates frames in the collapsed format
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ':')
+
+
+class Profiler:
+    """
+    Wall-clock sampling profiler over every thread of this process. It samples
+    from its own background thread, so the worker keeps serving requests (even
+    a sync gunicorn worker) and those requests are what ends up in the profile.
+    One profile at a time; the last result is kept until the next one starts.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._result = None
+
+    def start(self, seconds, interval=0.01, thread_name=None):
+        """Start sampling for `seconds`; False if a profile is already running"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._result = None
+            self._thread = threading.Thread(target=self._run, args=(seconds, interval, thread_name),
+                                            name='debug-profiler', daemon=True)
+            self._thread.start()
+            return True
+
+    def running(self):
+        with self._lock:
+            return self._thread is not None and self._thread.is_alive()
+
+    def result(self):
+        """Collapsed stacks of the last finished profile, or None"""
+        with self._lock:
+            return self._result
+
+    def _run(self, seconds, interval, thread_name):
+        stacks = self.sample(seconds, interval, thread_name)
+        with self._lock:
+            self._result = stacks
+
+    @staticmethod
+    def sample(seconds, interval=0.01, thread_name=None):
+        """Collapsed stacks ("thread;outer;...;inner count" lines) of the other threads, sampled every `interval` seconds"""
+        stacks = collections.Counter()
+        me = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        samples = 0
+        while time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident, str(ident))
+                if ident == me or (thread_name and not name.startswith(thread_name)):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                stack.append(name.replace(';', ':').replace(' ', '_'))
+                stacks[';'.join(reversed(stack))] += 1
+            samples += 1
+            time.sleep(interval)
+        logger.info(f"Profiled {samples} samples over {seconds}s")
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class MemoryTracer:
+    """tracemalloc snapshots on demand; each snapshot is compared to the one before it"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._previous = None
+
+    def start(self, frames=TRACEMALLOC_FRAMES):
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+            self._previous = None
+
+    def stop(self):
+        with self._lock:
+            tracemalloc.stop()
+            self._previous = None
+
+    def snapshot(self, group_by='lineno', limit=20, compare=True):
+        """Top allocation sites, with the change since the previous snapshot when `compare` is set"""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                return None
+            snapshot = tracemalloc.take_snapshot().filter_traces(TRACE_FILTERS)
+            previous, self._previous = self._previous, snapshot
+            current, peak = tracemalloc.get_traced_memory()
+
+        if compare and previous is not None:
+            stats = snapshot.compare_to(previous, group_by)
+        else:
+            stats = snapshot.statistics(group_by)
+        return {
+            'traced_mb': round(current / 1024 / 1024, 3),
+            'peak_mb': round(peak / 1024 / 1024, 3),
+            'compared': compare and previous is not None,
+            'top': [{
+                'traceback': stat.traceback.format(),
+                'size_kb': round(stat.size / 1024, 1),
+                'count': stat.count,
+                'size_diff_kb': round(getattr(stat, 'size_diff', 0) / 1024, 1),
+                'count_diff': getattr(stat, 'count_diff', 0),
+            } for stat in stats[:limit]],
+        }
+
+
+profiler = Profiler()
+memory_tracer = MemoryTracer()
+
+
+def _authorized():
+    return hmac.compare_digest(request.headers.get('X-Debug-Token', ''), DEBUG_TOKEN)
+
+
+def register_debug_routes(app):
+    """Add the /api/debug routes to the app; a no-op unless DEBUG_TOKEN is set"""
+    if not DEBUG_TOKEN:
+        return
+
+    @app.before_request
+    def require_debug_token():
+        if request.path.startswith('/api/debug/') and not _authorized():
+            return jsonify({'error': 'Forbidden'}), 403
+        return None
+
+    @app.route('/api/debug/profile', methods=['POST'])
+    def debug_profile_start():
+        """Start profiling this worker in the background; fetch the result with GET once `seconds` have passed"""
+        seconds = min(request.args.get('seconds', 10, type=float), PROFILE_MAX_SECONDS)
+        interval = max(request.args.get('interval', 0.01, type=float), 0.001)
+        if not profiler.start(seconds, interval, request.args.get('thread')):
+            return jsonify({'error': 'A profile is already running in this worker', 'pid': os.getpid()}), 409
+        return jsonify({'profiling': True, 'seconds': seconds, 'pid': os.getpid()}), 202
+
+    @app.route('/api/debug/profile', methods=['GET'])
+    def debug_profile():
+        """Collapsed stacks of this worker for flamegraph.pl or speedscope"""
+        if profiler.running():
+            return jsonify({'profiling': True, 'pid': os.getpid()}), 202
+        collapsed = profiler.result()
+        if collapsed is None:
+            return jsonify({'error': 'No profile in this worker, POST /api/debug/profile first', 'pid': os.getpid()}), 404
+        return Response(collapsed, mimetype='text/plain', headers={'X-Worker-Pid': str(os.getpid())})
+
+    @app.route('/api/debug/memory/start', methods=['POST'])
+    def debug_memory_start():
+        memory_tracer.start(request.args.get('frames', TRACEMALLOC_FRAMES, type=int))
+        return jsonify({'tracing': True, 'pid': os.getpid()})
+
+    @app.route('/api/debug/memory', methods=['GET'])
+    def debug_memory():
+        group_by = request.args.get('group_by', 'lineno')
+        if group_by not in ('lineno', 'filename', 'traceback'):
+            return jsonify({'error': f"Unknown group_by: {group_by}"}), 400
+        result = memory_tracer.snapshot(group_by, request.args.get('limit', 20, type=int),
+                                        request.args.get('compare', '1') == '1')
+        if result is None:
+            return jsonify({'error': 'Tracing is not running, POST /api/debug/memory/start first'}), 409
+        return jsonify(dict(result, pid=os.getpid()))
+
+    @app.route('/api/debug/memory/stop', methods=['POST'])
+    def debug_memory_stop():
+        memory_tracer.stop()
+        return jsonify({'tracing': False, 'pid': os.getpid()})
+
+    logger.warning("Debug routes enabled under /api/debug")
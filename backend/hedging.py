@@ -0,0 +1,196 @@
+import collections
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+HEDGING_ENABLED = os.environ.get('LLM_HEDGING', '0') == '1'
+HEDGE_MODEL = os.environ.get('HEDGE_MODEL')  # None means hedge with the same model
+HEDGE_PERCENTILE = float(os.environ.get('HEDGE_PERCENTILE', 95))
+HEDGE_MAX_RATIO = float(os.environ.get('HEDGE_MAX_RATIO', 0.1))
+HEDGE_DEFAULT_DEADLINE = float(os.environ.get('HEDGE_DEFAULT_DEADLINE', 3.0))
+# Upper bound on a hedged call, so a cancelled one that never streams a token does not stay open
+HEDGE_REQUEST_TIMEOUT = float(os.environ.get('HEDGE_REQUEST_TIMEOUT', 60))
+
+
+def _percentile(values, percentile):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percentile / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Attempt:
+    """One upstream call. The call reports its progress here and stops early once `cancelled` is set"""
+
+    def __init__(self, hedger, name, on_change):
+        self.hedger = hedger
+        self.name = name
+        self.cancelled = threading.Event()
+        self.start_time = None
+        self.first_token_time = None
+        self.launched_at = time.monotonic()
+        self.result = None
+        self.error = None
+        self.finished = False
+        self._on_change = on_change
+
+    def started(self):
+        """Call once the request has actually been sent (after any scheduler wait)"""
+        self.start_time = time.monotonic()
+        self._on_change(self)
+
+    def first_token(self):
+        if self.first_token_time is None:
+            self.first_token_time = time.monotonic()
+            self.hedger.record_first_token(self.first_token_time - (self.start_time or self.launched_at))
+            self._on_change(self)
+
+
+class Hedger:
+    """
+    Issues a second request when the first one has not produced a token by a
+    percentile-based deadline. Whichever produces a first token first wins and
+    the other is cancelled. Hedges are paid for out of a budget that grows by
+    `max_ratio` per request, so hedging adds at most that fraction of extra load.
+    """
+
+    def __init__(self, percentile=95, default_deadline=3.0, max_ratio=0.1, window=500, min_samples=20):
+        self.percentile = percentile
+        self.default_deadline = default_deadline
+        self.max_ratio = max_ratio
+        self.min_samples = min_samples
+        self._latencies = collections.deque(maxlen=window)
+        self._budget = 1.0
+        self._lock = threading.Lock()
+        self._stats = {
+            'requests': 0,
+            'hedges_fired': 0,
+            'hedge_wins': 0,
+            'budget_denied': 0,
+            'saved_seconds': 0.0,
+        }
+
+    def deadline(self):
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return self.default_deadline
+            return _percentile(self._latencies, self.percentile)
+
+    def record_first_token(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def _take_budget(self):
+        with self._lock:
+            if self._budget >= 1.0:
+                self._budget -= 1.0
+                self._stats['hedges_fired'] += 1
+                return True
+            self._stats['budget_denied'] += 1
+            return False
+
+    def run(self, primary, hedge):
+        """
+        `primary` and `hedge` are callables taking an Attempt and returning the result.
+        Returns the winning attempt's result or raises its error.
+        """
+        with self._lock:
+            self._stats['requests'] += 1
+            self._budget = min(10.0, self._budget + self.max_ratio)
+
+        changed = threading.Condition()
+        attempts = []
+        state = {'winner': None}
+
+        def on_change(attempt):
+            with changed:
+                winner = state['winner']
+                if winner is None and attempt.first_token_time is not None:
+                    state['winner'] = attempt
+                elif winner is not None and winner is not attempt and attempt.name == 'primary' \
+                        and attempt.first_token_time is not None and not attempt.finished:
+                    # The hedge won and the cancelled primary just reported when its first token came
+                    self._record_saving(attempt.first_token_time - winner.first_token_time)
+                changed.notify_all()
+
+        def launch(name, fn):
+            attempt = Attempt(self, name, on_change)
+
+            def target():
+                try:
+                    attempt.result = fn(attempt)
+                except Exception as e:
+                    attempt.error = e
+                finally:
+                    attempt.finished = True
+                    on_change(attempt)
+
+            attempts.append(attempt)
+            threading.Thread(target=target, name=f'llm-{name}', daemon=True).start()
+            return attempt
+
+        first = launch('primary', primary)
+        with changed:
+            # The deadline only starts counting once the scheduler has let the request through
+            changed.wait_for(lambda: first.start_time is not None or first.finished)
+            deadline = first.start_time + self.deadline() if first.start_time else 0
+            changed.wait_for(lambda: state['winner'] or first.finished,
+                             timeout=max(0.0, deadline - time.monotonic()))
+            hedged = state['winner'] is None and not first.finished and self._take_budget()
+
+        if hedged:
+            logger.debug("Primary LLM request is slow, sending a hedged request")
+            second = launch('hedge', hedge)
+
+        with changed:
+            changed.wait_for(lambda: state['winner'] or all(a.finished for a in attempts))
+            winner = state['winner']
+
+        if winner is None:
+            # Nothing produced a token; report the primary's outcome
+            if first.error is not None:
+                raise first.error
+            return first.result
+
+        for attempt in attempts:
+            if attempt is not winner:
+                attempt.cancelled.set()
+
+        if hedged and winner is second:
+            with self._lock:
+                self._stats['hedge_wins'] += 1
+
+        with changed:
+            changed.wait_for(lambda: winner.finished)
+        if winner.error is not None:
+            raise winner.error
+        return winner.result
+
+    def _record_saving(self, seconds):
+        with self._lock:
+            self._stats['saved_seconds'] += max(0.0, seconds)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['saved_seconds'] = round(stats['saved_seconds'], 3)
+            latencies = list(self._latencies)
+        # LLM_HEDGING only sets the default, generate(..., hedge=True) hedges regardless
+        stats['enabled_by_default'] = HEDGING_ENABLED
+        stats['enabled'] = HEDGING_ENABLED or stats['requests'] > 0
+        stats['deadline'] = round(self.deadline(), 3)
+        stats['hedge_rate'] = round(stats['hedges_fired'] / stats['requests'], 3) if stats['requests'] else 0.0
+        if latencies:
+            stats['first_token_p50'] = round(_percentile(latencies, 50), 3)
+            stats['first_token_p95'] = round(_percentile(latencies, 95), 3)
+            stats['first_token_p99'] = round(_percentile(latencies, 99), 3)
+        return stats
+
+
+hedger = Hedger(
+    percentile=HEDGE_PERCENTILE,
+    default_deadline=HEDGE_DEFAULT_DEADLINE,
+    max_ratio=HEDGE_MAX_RATIO,
+)
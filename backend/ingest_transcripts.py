@@ -0,0 +1,209 @@
+"""
+Bulk-index a back catalogue of transcripts into the persistent vector index.
+
+    python ingest_transcripts.py transcripts/            # every *.json file under the directory
+    python ingest_transcripts.py manifest.txt            # one transcript path per line
+
+Files are split, timestamped and embedded across a process pool and written as
+FAISS shards to VECTOR_INDEX_DIR/shards. Finished files are recorded in
+VECTOR_INDEX_DIR/ingested.jsonl, so an interrupted run picks up where it
+stopped. Runs on its own, the serving workers are not involved.
+"""
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+
+from transcripts import VECTOR_INDEX_DIR, SHARDS_DIR, load_transcript, split_transcript, text_splitter
+
+logger = logging.getLogger('ingest_transcripts')
+
+MANIFEST = 'ingested.jsonl'
+
+# Set once per worker process by _init_worker
+_embeddings = None
+_splitter = None
+
+
+def find_transcripts(source, pattern='.json'):
+    """Transcript paths from a directory (recursively) or a manifest file with one path per line"""
+    if os.path.isdir(source):
+        paths = [os.path.join(root, name) for root, _, names in os.walk(source)
+                 for name in names if name.endswith(pattern)]
+    else:
+        base = os.path.dirname(os.path.abspath(source))
+        with open(source, encoding='utf-8') as f:
+            lines = [line.strip() for line in f]
+        paths = [os.path.join(base, line) for line in lines if line and not line.startswith('#')]
+    return sorted(os.path.abspath(p) for p in paths)
+
+
+def read_manifest(index_dir):
+    """Files already ingested and the shards that hold them"""
+    done, shards = set(), set()
+    try:
+        with open(os.path.join(index_dir, MANIFEST), encoding='utf-8') as f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    # Half-written last line of an interrupted run
+                    continue
+                done.add(item['path'])
+                if item.get('shard'):
+                    shards.add(item['shard'])
+    except FileNotFoundError:
+        pass
+    return done, shards
+
+
+def remove_orphan_shards(index_dir, shards):
+    """Drop shards an interrupted run wrote but never recorded, their files get ingested again"""
+    shards_dir = os.path.join(index_dir, SHARDS_DIR)
+    if not os.path.isdir(shards_dir):
+        return
+    for name in os.listdir(shards_dir):
+        if name not in shards:
+            logger.info(f"Removing unrecorded shard {name}")
+            shutil.rmtree(os.path.join(shards_dir, name), ignore_errors=True)
+
+
+def _init_worker(threads, make_embeddings=None):
+    global _embeddings, _splitter
+    try:
+        import torch
+        # Several processes embedding at once; do not let each of them use every core
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    if make_embeddings is None:
+        from langchain_huggingface import HuggingFaceEmbeddings
+        make_embeddings = HuggingFaceEmbeddings
+
+    _embeddings = make_embeddings()
+    _splitter = text_splitter()
+
+
+def _ingest_shard(shard_id, paths, index_dir):
+    """Split and embed a group of transcripts into one shard; runs in a worker process"""
+    from langchain_community.vectorstores import FAISS
+
+    texts, metadatas, ingested, failed = [], [], [], []
+    for path in paths:
+        try:
+            chunks, chunk_metadatas = split_transcript(
+                load_transcript(path), _splitter,
+                video_id=os.path.splitext(os.path.basename(path))[0], path=path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            failed.append((path, str(e)))
+            continue
+        texts.extend(chunks)
+        metadatas.extend(chunk_metadatas)
+        ingested.append(path)
+
+    if not texts:
+        return {'shard': None, 'files': ingested, 'failed': failed, 'chunks': 0}
+
+    # Write next to the final location and rename, so a shard is either complete or absent
+    shards_dir = os.path.join(index_dir, SHARDS_DIR)
+    tmp_dir = os.path.join(shards_dir, f".tmp-{shard_id}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    FAISS.from_texts(texts, _embeddings, metadatas=metadatas).save_local(tmp_dir)
+    shutil.rmtree(os.path.join(shards_dir, shard_id), ignore_errors=True)
+    os.replace(tmp_dir, os.path.join(shards_dir, shard_id))
+    return {'shard': shard_id, 'files': ingested, 'failed': failed, 'chunks': len(texts)}
+
+
+def shard_id(paths):
+    return hashlib.sha1("\n".join(paths).encode()).hexdigest()[:16]
+
+
+def ingest(paths, index_dir=VECTOR_INDEX_DIR, workers=None, files_per_shard=50, max_pending=None,
+           make_embeddings=None):
+    """
+    Ingest every path not in the manifest yet; returns (files ingested, chunks, failed paths).
+    `make_embeddings` builds the embedding model in each worker (HuggingFaceEmbeddings by default).
+    """
+    os.makedirs(os.path.join(index_dir, SHARDS_DIR), exist_ok=True)
+    done, shards = read_manifest(index_dir)
+    remove_orphan_shards(index_dir, shards)
+    todo = [p for p in paths if p not in done]
+    logger.info(f"{len(paths)} transcripts, {len(paths) - len(todo)} already ingested, {len(todo)} to go")
+    if not todo:
+        return 0, 0, []
+
+    workers = workers or os.cpu_count() or 1
+    # Only this many groups are read, embedded or waiting to be recorded at any time
+    max_pending = max_pending or workers * 2
+    groups = iter([todo[i:i + files_per_shard] for i in range(0, len(todo), files_per_shard)])
+    threads = max(1, (os.cpu_count() or 1) // workers)
+
+    files = chunks = 0
+    failed = []
+    started = time.monotonic()
+    # spawn: the embedding model does not survive a fork well
+    with concurrent.futures.ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                                                initializer=_init_worker, initargs=(threads, make_embeddings)) as pool, \
+            open(os.path.join(index_dir, MANIFEST), 'a', encoding='utf-8') as manifest:
+        pending = {}
+        while True:
+            for group in groups:
+                pending[pool.submit(_ingest_shard, shard_id(group), group, index_dir)] = group
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                break
+            finished, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in finished:
+                group = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # Left out of the manifest, so the next run tries the group again
+                    logger.error(f"Shard {shard_id(group)} failed: {str(e)}")
+                    result = {'shard': None, 'files': [], 'failed': [(p, str(e)) for p in group], 'chunks': 0}
+                for path in result['files']:
+                    manifest.write(json.dumps({'path': path, 'shard': result['shard']}) + "\n")
+                manifest.flush()
+                for path, error in result['failed']:
+                    logger.warning(f"Skipped {path}: {error}")
+                files += len(result['files'])
+                chunks += result['chunks']
+                failed.extend(path for path, _ in result['failed'])
+
+            elapsed = time.monotonic() - started
+            processed = files + len(failed)
+            rate = processed / elapsed if elapsed else 0.0
+            eta = (len(todo) - processed) / rate if rate else 0.0
+            logger.info(f"{processed}/{len(todo)} transcripts, {chunks} chunks, "
+                        f"{rate:.1f} files/s, {chunks / elapsed if elapsed else 0.0:.0f} chunks/s, eta {eta:.0f}s")
+
+    logger.info(f"Ingested {files} transcripts ({chunks} chunks) in {time.monotonic() - started:.1f}s, "
+                f"{len(failed)} failed")
+    return files, chunks, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-index transcripts into the persistent vector index")
+    parser.add_argument('source', help="directory of transcript .json files, or a manifest with one path per line")
+    parser.add_argument('--index-dir', default=VECTOR_INDEX_DIR, help="vector index directory (%(default)s)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (one per cpu)")
+    parser.add_argument('--files-per-shard', type=int, default=50, help="transcripts per shard (%(default)s)")
+    parser.add_argument('--max-pending', type=int, default=None,
+                        help="shards in flight at once, bounds memory (twice the workers)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    _, _, failed = ingest(find_transcripts(args.source), args.index_dir, args.workers,
+                          args.files_per_shard, args.max_pending)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,58 @@
+import logging
+
+import google.generativeai as genai
+
+from hedging import hedger, HEDGING_ENABLED, HEDGE_MODEL, HEDGE_REQUEST_TIMEOUT
+from scheduler import scheduler, estimate_tokens, PRIORITY_INTERACTIVE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = 'gemini-2.0-flash-001'
+
+
+def generate(prompt, model_name=DEFAULT_MODEL, priority=PRIORITY_INTERACTIVE,
+             generation_config=None, expected_output=1024, hedge=None):
+    """Send a prompt to Gemini through the shared scheduler and return the response text"""
+    est_tokens = estimate_tokens(prompt, expected_output)
+    if hedge is None:
+        hedge = HEDGING_ENABLED
+    if hedge:
+        return hedger.run(
+            _streamed_attempt(prompt, model_name, generation_config, est_tokens, priority),
+            _streamed_attempt(prompt, HEDGE_MODEL or model_name, generation_config, est_tokens, priority),
+        )
+
+    model = genai.GenerativeModel(model_name)
+    response = scheduler.submit(
+        lambda: model.generate_content(prompt, generation_config=generation_config),
+        est_tokens, priority)
+
+    usage = getattr(response, 'usage_metadata', None)
+    scheduler.reconcile(est_tokens, getattr(usage, 'total_token_count', None))
+    return response.text
+
+
+def _streamed_attempt(prompt, model_name, generation_config, est_tokens, priority):
+    """A streaming call for the hedger, so it can tell when the first token arrives"""
+
+    def call(attempt):
+        if attempt.cancelled.is_set():
+            return None
+        model = genai.GenerativeModel(model_name)
+        attempt.started()
+        # The losing call is only cancelled once it streams something; the timeout ends it otherwise
+        response = model.generate_content(prompt, generation_config=generation_config, stream=True,
+                                          request_options={'timeout': HEDGE_REQUEST_TIMEOUT})
+        parts = []
+        for chunk in response:
+            attempt.first_token()
+            if attempt.cancelled.is_set():
+                # Dropping the iterator closes the stream
+                logger.debug(f"Cancelled {attempt.name} request to {model_name}")
+                return None
+            parts.append(chunk.text)
+        usage = getattr(response, 'usage_metadata', None)
+        scheduler.reconcile(est_tokens, getattr(usage, 'total_token_count', None))
+        return "".join(parts)
+
+    return lambda attempt: scheduler.submit(lambda: call(attempt), est_tokens, priority)
@@ -0,0 +1,184 @@
+import re
+import sys
+
+# Words a template may leave unmatched without changing what is being asked
+FILLER_WORDS = {'a', 'an', 'the', 'is', 'are', 'was', 'were', 'what', 'whats', 's', 'of', 'for', 'in', 'on',
+                'at', 'with', 'by', 'from', 'to', 'do', 'does', 'did', 'we', 'our', 'there', 'have', 'has',
+                'dataset', 'data', 'crm', 'please', 'tell', 'me'}
+# Qualifiers the templates cannot express: negation, comparisons, ordering, lists of entities,
+# and anything that needs reasoning. One of these anywhere in the question sends it to Gemini
+UNSUPPORTED_WORDS = {'not', 'no', 't', 'without', 'except', 'excluding', 'never', 'non', 'other', 'others',
+                     'which', 'who', 'whom', 'whose', 'list', 'name', 'names', 'each', 'every', 'per',
+                     'highest', 'lowest', 'largest', 'smallest', 'biggest', 'best', 'worst', 'most', 'least',
+                     'top', 'bottom', 'more', 'less', 'fewer', 'over', 'under', 'above', 'below', 'than',
+                     'greater', 'between', 'before', 'after', 'since', 'until', 'during', 'year', 'month',
+                     'average', 'mean', 'median', 'why', 'compare', 'comparison', 'trend', 'recommend',
+                     'should', 'explain', 'summary', 'summarize', 'insight', 'insights', 'predict', 'and', 'or'}
+
+ACCOUNT_FIELDS = [
+    (('sector', 'industry'), 'sector', "{account} is in the {value} sector.", ()),
+    (('revenue',), 'revenue', "{account} has a revenue of {value}.", ()),
+    (('employees', 'headcount', 'staff'), 'employees', "{account} has {value} employees.", ('how', 'many')),
+    (('established', 'founded'), 'year_established', "{account} was established in {value}.", ('when',)),
+    (('located', 'location', 'country', 'office'), 'office_location', "{account} is located in {value}.",
+     ('where', 'based')),
+    (('subsidiary', 'parent'), 'subsidiary_of', "{account} is a subsidiary of {value}.", ('company',)),
+]
+
+DEAL_STAGES = ('won', 'lost', 'engaging', 'prospecting')
+# Words in a counting question that select a deal stage ("how many deals did X lose")
+STAGE_WORDS = {'won': 'won', 'win': 'won', 'lost': 'lost', 'lose': 'lost',
+               'engaging': 'engaging', 'prospecting': 'prospecting'}
+DEAL_WORDS = r'\b(deals?|opportunit(y|ies))\b'
+
+
+def _key(name):
+    return re.sub(r'[^a-z0-9]', '', name.lower())
+
+
+def _pattern(name):
+    # "GTX Pro" should also match "GTXPro" and the other way round
+    chars = [re.escape(c) for c in _key(name)]
+    return re.compile(r'\b' + r'[\s\-&]*'.join(chars) + r'\b', re.IGNORECASE)
+
+
+class LocalAnswerer:
+    """Answers simple lookup and counting questions straight from the CRM tables"""
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.products = {_key(r['product']): r for r in tables['products']}
+        self.agents = {_key(r['sales_agent']): r for r in tables['sales_teams']}
+        self.accounts = {_key(r['account']): r for r in tables['accounts']}
+        # Names are compared by _key, so the pipeline's "GTXPro" matches the products table's "GTX Pro"
+        self.patterns = {
+            kind: sorted(((key, _pattern(key)) for key in lookup if key), key=lambda p: -len(p[0]))
+            for kind, lookup in (('product', self.products), ('agent', self.agents), ('account', self.accounts))
+        }
+
+    def memory_bytes(self):
+        """Size of the lookup indexes; the rows themselves belong to the snapshot"""
+        return sum(sys.getsizeof(lookup) for lookup in (self.products, self.agents, self.accounts)) + \
+            sum(sys.getsizeof(pattern) for patterns in self.patterns.values() for _, pattern in patterns)
+
+    def _find(self, kind, question):
+        found = []
+        for key, pattern in self.patterns[kind]:
+            if key not in found and pattern.search(question):
+                found.append(key)
+        return found
+
+    def entities(self, question):
+        """Products, agents, accounts and deal stages mentioned in the question"""
+        return {
+            'products': self._find('product', question),
+            'agents': self._find('agent', question),
+            'accounts': self._find('account', question),
+            'stages': [stage for stage in DEAL_STAGES if re.search(rf'\b{stage}\b', question.lower())],
+        }
+
+    def _residue(self, question):
+        """The question in lower case with every entity mention taken out"""
+        text = question.lower()
+        for patterns in self.patterns.values():
+            for _, pattern in patterns:
+                text = pattern.sub(' ', text)
+        return text
+
+    @staticmethod
+    def _matches(text, phrases, extra=()):
+        """True if every phrase is in the text and only filler (or `extra`) words are left over"""
+        for phrase in phrases:
+            text, found = re.subn(phrase, ' ', text)
+            if not found:
+                return False
+        return all(word in FILLER_WORDS or word in extra for word in re.findall(r'[a-z0-9]+', text))
+
+    def answer(self, question):
+        """
+        Return a plain text answer, or None if the question needs the LLM. A
+        question is only answered here when a template accounts for every word
+        in it, so qualifiers we do not understand are never silently dropped.
+        """
+        found = self.entities(question)
+        products, agents, accounts = found['products'], found['agents'], found['accounts']
+        text = self._residue(question)
+        words = re.findall(r'[a-z0-9]+', text)
+        if any(word in UNSUPPORTED_WORDS or any(c.isdigit() for c in word) for word in words):
+            return None
+
+        stages = sorted({STAGE_WORDS[word] for word in words if word in STAGE_WORDS})
+        deal_words = set(STAGE_WORDS) | {'deal', 'deals', 'opportunity', 'opportunities', 'all', 'stage'}
+
+        if self._matches(text, [r'\bhow many\b', DEAL_WORDS], deal_words | {'total', 'pipeline', 'currently'}):
+            rows = self._filter_deals(products, agents, accounts, stages)
+            if rows is None:
+                return None
+            return f"There are {len(rows)} {self._deal_scope(products, agents, accounts, stages)} in the dataset."
+
+        if self._matches(text, [r'\b(total|sum)\b', r'\b(close|closed|closing|deal) values?\b'], deal_words):
+            rows = self._filter_deals(products, agents, accounts, stages)
+            if rows is None:
+                return None
+            total = sum(int(r['close_value']) for r in rows if r['close_value'])
+            scope = self._deal_scope(products, agents, accounts, stages)
+            return f"The total close value of {scope} is {total} ({len(rows)} deals in the dataset)."
+
+        # The lookups below only make sense for exactly one entity
+        if len(products) + len(agents) + len(accounts) != 1:
+            return None
+
+        if products and self._matches(text, [r'\b(sales price|price|costs?|how much)\b']):
+            row = self.products.get(products[0])
+            if row:
+                return f"The sales price of {row['product']} is {row['sales_price']}."
+
+        if agents:
+            row = self.agents.get(agents[0])
+            if row and self._matches(text, [r'\b(manager|reports? to|boss)\b']):
+                return f"{row['sales_agent']}'s manager is {row['manager']}."
+            if row and self._matches(text, [r'\b(regional office|office|region)\b'],
+                                     ('work', 'works', 'where', 'based', 'located')):
+                return f"{row['sales_agent']} works in the {row['regional_office']} regional office."
+
+        if accounts:
+            row = self.accounts.get(accounts[0])
+            # "the revenue of X's parent company" names two fields; only answer when one is asked for
+            fields = [f for f in ACCOUNT_FIELDS if re.search(rf"\b({'|'.join(f[0])})\b", text)]
+            if row and len(fields) == 1:
+                words, field, template, extra = fields[0]
+                if not self._matches(text, [rf"\b({'|'.join(words)})\b"], extra):
+                    return None
+                if not row[field]:
+                    if field == 'subsidiary_of':
+                        return f"{row['account']} is not a subsidiary of another account."
+                    return None
+                return template.format(account=row['account'], value=row[field])
+
+        return None
+
+    def _filter_deals(self, products, agents, accounts, stages):
+        # Counting over several values of the same kind is ambiguous ("X and Y" vs "X or Y")
+        if len(products) > 1 or len(agents) > 1 or len(accounts) > 1 or len(stages) > 1:
+            return None
+        rows = self.tables['sales_pipeline']
+        if products:
+            rows = [r for r in rows if _key(r['product']) == products[0]]
+        if agents:
+            rows = [r for r in rows if _key(r['sales_agent']) == agents[0]]
+        if accounts:
+            rows = [r for r in rows if _key(r['account']) == accounts[0]]
+        if stages:
+            rows = [r for r in rows if r['deal_stage'].lower() == stages[0]]
+        return rows
+
+    def _deal_scope(self, products, agents, accounts, stages):
+        parts = [f"{stages[0]} deals" if stages else "deals"]
+        if products:
+            row = self.products.get(products[0])
+            parts.append(f"for {row['product'] if row else products[0]}")
+        if agents:
+            parts.append(f"by {self.agents[agents[0]]['sales_agent']}")
+        if accounts:
+            parts.append(f"with {self.accounts[accounts[0]]['account']}")
+        return " ".join(parts)
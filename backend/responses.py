@@ -0,0 +1,108 @@
+import gzip
+import json
+import logging
+import os
+
+from flask import jsonify, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Bodies smaller than this are sent as they are, compressing them costs more than it saves
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', 5))
+COMPRESSIBLE_TYPES = ('application/json', 'text/plain', 'text/html', 'text/csv')
+
+# Dates go through Flask's default() so they are written the same way as before (HTTP dates)
+ORJSON_OPTIONS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+
+def dumps(obj):
+    """Compact JSON text, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=DefaultJSONProvider.default, option=ORJSON_OPTIONS).decode()
+    return json.dumps(obj, default=DefaultJSONProvider.default, ensure_ascii=False, separators=(',', ':'))
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that serializes (and parses) with orjson when it is installed"""
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs.get('indent'):
+            return super().dumps(obj, **kwargs)
+        option = ORJSON_OPTIONS
+        # Same key order as Flask's own provider, which sorts by default
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
+def negotiate_encoding():
+    """The compression the client prefers among the ones we can produce, or None"""
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(offered)
+
+
+def compress_response(response):
+    """after_request hook: gzip or brotli compress buffered text responses above COMPRESS_MIN_BYTES"""
+    if (response.direct_passthrough or response.is_streamed or response.status_code < 200
+            or response.status_code in (204, 206, 304) or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        # Server-sent event streams have to reach the client as they are produced
+        return response
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding()
+    if encoding == 'br':
+        response.set_data(brotli.compress(data, quality=BROTLI_QUALITY))
+    elif encoding == 'gzip':
+        response.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL))
+    else:
+        return response
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def cacheable_json(data, max_age=0, etag=None):
+    """
+    JSON response with an ETag; answers a matching If-None-Match with a 304 and
+    no body. Meant for payloads that rarely change between requests, such as a
+    video's transcript or the dataset description. The ETag is a hash of the
+    body unless `etag` (e.g. a dataset version) is given.
+    """
+    response = jsonify(data)
+    # Weak, since the gzip and brotli encodings of the body are the same resource
+    if etag is not None:
+        response.set_etag(etag, weak=True)
+    else:
+        response.add_etag(weak=True)
+    response.cache_control.max_age = max_age
+    if not max_age:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def init_app(app):
+    app.json = FastJSONProvider(app)
+    app.after_request(compress_response)
+    logger.debug(f"JSON responses use {'orjson' if orjson else 'json'}, "
+                 f"compression: {'br, gzip' if brotli else 'gzip'} above {COMPRESS_MIN_BYTES} bytes")
@@ -0,0 +1,219 @@
+import heapq
+import itertools
+import logging
+import math
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Lower number = served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+
+class QuotaExceeded(Exception):
+    """Raised when a request is shed instead of being queued for Gemini"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+class TokenBucket:
+    """Simple token bucket refilled continuously at `per_minute` units per minute"""
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(capacity if capacity is not None else per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def cost(self, amount):
+        """Units one request takes; requests bigger than the bucket are allowed once it is full"""
+        return min(amount, self.capacity)
+
+    def time_until(self, amount, now=None):
+        """Seconds until `amount` units are available (0 if available now); may be more than one bucketful"""
+        now = now if now is not None else time.monotonic()
+        self._refill(now)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self.tokens -= self.cost(amount)
+
+    def drain(self, seconds):
+        """Empty the bucket so nothing is sent for roughly `seconds`"""
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class LLMScheduler:
+    """
+    Admission control in front of every upstream LLM call.
+
+    Callers block in `submit` until both the request-per-minute and
+    token-per-minute budgets allow their call. Waiting requests are served
+    by priority, then arrival order. Requests whose expected wait exceeds
+    `max_wait` (or that arrive when the queue is full) are rejected right
+    away with `QuotaExceeded`, so the caller can answer 429 instead of
+    piling more work onto an exhausted quota.
+
+    `rpm` and `tpm` are the budgets of the whole API key. Every process that
+    calls Gemini has its own scheduler, so each one only takes its share:
+    the budgets divided by `processes`.
+    """
+
+    def __init__(self, rpm, tpm, max_queue=50, max_wait=30.0, processes=1):
+        self.processes = max(1, processes)
+        self.requests = TokenBucket(rpm / self.processes)
+        self.tokens = TokenBucket(tpm / self.processes)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._lock = threading.Condition()
+        self._queue = []
+        self._counter = itertools.count()
+        self._stats = {
+            'admitted': 0,
+            'rejected': 0,
+            'completed': 0,
+            'failed': 0,
+            'upstream_throttled': 0,
+            'total_wait': 0.0,
+        }
+
+    def _queue_limit(self, priority):
+        # Background work is shed first, well before interactive traffic
+        if priority >= PRIORITY_BACKGROUND:
+            return max(1, self.max_queue // 2)
+        return self.max_queue
+
+    def _ahead(self, priority):
+        """Queued requests that will be served before a new one: same or higher priority"""
+        return [entry for entry in self._queue if entry[0] <= priority]
+
+    def _expected_wait(self, priority, est_tokens, now):
+        """Rough wait for a new request: everything queued ahead of it plus itself"""
+        ahead = self._ahead(priority)
+        ahead_tokens = sum(self.tokens.cost(entry[2]) for entry in ahead)
+        wait_requests = self.requests.time_until(len(ahead) + 1, now)
+        wait_tokens = self.tokens.time_until(ahead_tokens + self.tokens.cost(est_tokens), now)
+        return max(wait_requests, wait_tokens)
+
+    def submit(self, fn, est_tokens, priority=PRIORITY_INTERACTIVE):
+        """Run `fn()` once the budgets allow it and return its result"""
+        with self._lock:
+            now = started = time.monotonic()
+            # Queued background work never counts against interactive requests
+            if len(self._ahead(priority)) >= self._queue_limit(priority):
+                self._stats['rejected'] += 1
+                wait = self._expected_wait(priority, est_tokens, now)
+                logger.warning(f"Shedding LLM request (priority {priority}), queue full")
+                raise QuotaExceeded("LLM queue is full", wait)
+            wait = self._expected_wait(priority, est_tokens, now)
+            if wait > self.max_wait:
+                self._stats['rejected'] += 1
+                logger.warning(f"Shedding LLM request (priority {priority}), expected wait {wait:.1f}s")
+                raise QuotaExceeded("LLM rate limit reached", wait)
+
+            entry = (priority, next(self._counter), est_tokens)
+            heapq.heappush(self._queue, entry)
+            self._stats['admitted'] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self._queue[0] is entry:
+                        wait = max(self.requests.time_until(1, now),
+                                   self.tokens.time_until(self.tokens.cost(est_tokens), now))
+                        if wait <= 0:
+                            self.requests.take(1)
+                            self.tokens.take(est_tokens)
+                            break
+                        self._lock.wait(wait)
+                    else:
+                        self._lock.wait()
+            finally:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._lock.notify_all()
+            self._stats['total_wait'] += time.monotonic() - started
+
+        try:
+            result = fn()
+        except Exception as e:
+            with self._lock:
+                self._stats['failed'] += 1
+                if _is_upstream_throttle(e):
+                    # Gemini said no; stop sending for a while and tell the client when to retry
+                    self._stats['upstream_throttled'] += 1
+                    self.requests.drain(self.max_wait / 2)
+                    raise QuotaExceeded("Gemini rate limit reached", self.max_wait / 2) from e
+            raise
+        with self._lock:
+            self._stats['completed'] += 1
+        return result
+
+    def reconcile(self, est_tokens, actual_tokens):
+        """Charge (or refund) the difference between estimated and actual token usage"""
+        if actual_tokens is None:
+            return
+        with self._lock:
+            self.tokens.tokens -= actual_tokens - est_tokens
+            self._lock.notify_all()
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            by_priority = {}
+            for priority, _, _ in self._queue:
+                by_priority[priority] = by_priority.get(priority, 0) + 1
+            stats = dict(self._stats)
+            admitted = stats['admitted'] or 1
+            stats['avg_wait'] = round(stats.pop('total_wait') / admitted, 3)
+            stats['queue_depth'] = len(self._queue)
+            stats['queue_depth_by_priority'] = {
+                'interactive': by_priority.get(PRIORITY_INTERACTIVE, 0),
+                'background': sum(n for p, n in by_priority.items() if p >= PRIORITY_BACKGROUND),
+            }
+            stats['expected_wait'] = round(
+                self._expected_wait(PRIORITY_INTERACTIVE, 0, now), 3)
+            stats['processes'] = self.processes
+            stats['rpm'] = round(self.requests.rate * 60, 3)
+            stats['tpm'] = round(self.tokens.rate * 60)
+            return stats
+
+
+def _is_upstream_throttle(error):
+    # google.api_core.exceptions.ResourceExhausted / TooManyRequests, without importing google here
+    return type(error).__name__ in ('ResourceExhausted', 'TooManyRequests') or getattr(error, 'code', None) == 429
+
+
+def estimate_tokens(text, expected_output=1024):
+    """Cheap token estimate (~4 characters per token) plus room for the answer"""
+    return len(text) // 4 + expected_output
+
+
+def process_count(environ=os.environ):
+    """
+    Processes sharing the Gemini key: GEMINI_PROCESSES, or gunicorn's
+    WEB_CONCURRENCY workers on each of the TENANT_NODES nodes
+    """
+    if environ.get('GEMINI_PROCESSES'):
+        return int(environ['GEMINI_PROCESSES'])
+    nodes = [n for n in environ.get('TENANT_NODES', '').split(',') if n.strip()]
+    return int(environ.get('WEB_CONCURRENCY', 1)) * max(1, len(nodes))
+
+
+scheduler = LLMScheduler(
+    rpm=int(os.environ.get('GEMINI_RPM', 15)),
+    tpm=int(os.environ.get('GEMINI_TPM', 1000000)),
+    max_queue=int(os.environ.get('GEMINI_MAX_QUEUE', 50)),
+    max_wait=float(os.environ.get('GEMINI_MAX_WAIT', 30)),
+    processes=process_count(),
+)
@@ -0,0 +1,276 @@
+import csv
+import hashlib
+import io
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DATASET_DIR = os.environ.get('DATASET_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+SNAPSHOT_DIR = os.environ.get('DATASET_SNAPSHOT_DIR', os.path.join(DATASET_DIR, '.snapshots'))
+POLL_SECONDS = float(os.environ.get('DATASET_POLL_SECONDS', 5))
+# Files modified more recently than this are probably still being written
+SETTLE_SECONDS = 1.0
+# Bumped whenever the way columns are typed or stored changes, so old caches are not reused
+SNAPSHOT_FORMAT = 2
+
+# Cached table directories: <table>-<digest>-v<format>
+SNAPSHOT_NAME = re.compile(r'.+-[0-9a-f]{16}-v[0-9]+')
+
+# Tables are given to Gemini in this order, any other csv files follow alphabetically
+TABLE_ORDER = ['sales_pipeline', 'accounts', 'products', 'sales_teams']
+
+
+# Plain decimals only: no leading zeros, exponents, nan/inf, "+" signs or digit separators
+NUMBER = re.compile(r'-?(0|[1-9][0-9]*)(\.[0-9]+)?')
+# Longer integers do not survive the float64 (nullable) or int64 columns
+MAX_INT_DIGITS = 15
+
+
+def _snapshot_name(name, digest):
+    return f"{name}-{digest}-v{SNAPSHOT_FORMAT}"
+
+
+def _column_kind(values):
+    """Pick a numeric dtype only if every value reads back as the exact same text, so ids like 0042 stay strings"""
+    filled = [v for v in values if v != '']
+    if not filled or not all(NUMBER.fullmatch(v) for v in filled):
+        return 'str'
+    if all('.' not in v for v in filled):
+        if all(str(int(v)) == v and len(v.lstrip('-')) <= MAX_INT_DIGITS for v in filled):
+            return 'int' if len(filled) == len(values) else 'int_nullable'
+        return 'str'
+    if all(_to_text(float(v), 'float') == v for v in filled):
+        return 'float'
+    return 'str'
+
+
+def _to_array(values, kind):
+    if kind == 'int':
+        return np.array([int(v) for v in values], dtype=np.int64)
+    if kind in ('int_nullable', 'float'):
+        return np.array([float(v) if v != '' else np.nan for v in values], dtype=np.float64)
+    return np.array(values, dtype=str)
+
+
+def _to_text(value, kind):
+    if kind == 'str':
+        return str(value)
+    if kind == 'int':
+        return str(int(value))
+    if math.isnan(value):
+        return ''
+    if kind == 'int_nullable' or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class TableSnapshot:
+    """
+    One parsed csv table. The columns are cached on disk as .npy files so a
+    table is parsed once per version, not once per worker. This saves parsing,
+    not memory: the csv text (for prompts) and the row dicts are kept in memory.
+    """
+
+    def __init__(self, name, digest, text, columns, kinds):
+        self.name = name
+        self.digest = digest
+        self.text = text
+        self.columns = columns
+        self.kinds = kinds
+        self._rows = None
+        self._rows_bytes = 0
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def column(self, name):
+        return self.columns[name]
+
+    def rows(self):
+        """Row dicts with the same string values as the csv (built once per table version)"""
+        if self._rows is None:
+            names = list(self.columns)
+            text_columns = [[_to_text(v, self.kinds[n]) for v in self.columns[n]] for n in names]
+            self._rows = [dict(zip(names, values)) for values in zip(*text_columns)]
+            self._rows_bytes = sum(sys.getsizeof(row) + sum(sys.getsizeof(v) for v in row.values())
+                                   for row in self._rows)
+        return self._rows
+
+    def memory_bytes(self):
+        """The csv text, the columns and the row dicts once they are built"""
+        return len(self.text) + sum(column.nbytes for column in self.columns.values()) + self._rows_bytes
+
+    @classmethod
+    def load(cls, name, text, digest, snapshot_dir=SNAPSHOT_DIR):
+        """Map the columns cached for `digest`, parsing the csv only if they are not on disk yet"""
+        path = os.path.join(snapshot_dir, _snapshot_name(name, digest))
+        if not os.path.exists(os.path.join(path, 'meta.json')):
+            cls._write(path, text)
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        columns = {}
+        for index, column in enumerate(meta['columns']):
+            columns[column] = np.load(os.path.join(path, f"{index}.npy"), mmap_mode='r')
+        return cls(name, digest, text, columns, dict(zip(meta['columns'], meta['kinds'])))
+
+    @staticmethod
+    def _write(path, text):
+        reader = csv.reader(io.StringIO(text))
+        header = next(reader)
+        records = [row + [''] * (len(header) - len(row)) for row in reader if row]
+        values = list(zip(*records)) if records else [[] for _ in header]
+        kinds = [_column_kind(list(v)) for v in values]
+
+        # Write next to the final location and rename, so other workers never see half a snapshot
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=os.path.dirname(path))
+        try:
+            for index, (column_values, kind) in enumerate(zip(values, kinds)):
+                np.save(os.path.join(tmp, f"{index}.npy"), _to_array(list(column_values), kind))
+            with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+                json.dump({'columns': header, 'kinds': kinds, 'rows': len(records)}, f)
+            os.rename(tmp, path)
+        except OSError:
+            # Another worker got there first
+            shutil.rmtree(tmp, ignore_errors=True)
+            if not os.path.exists(os.path.join(path, 'meta.json')):
+                raise
+
+
+class DatasetSnapshot:
+    """An immutable set of tables plus anything derived from them (indexes, answerers)"""
+
+    def __init__(self, tables, files):
+        self.tables = tables
+        self.files = files
+        combined = "".join(f"{name}:{table.digest};" for name, table in tables.items())
+        self.version = hashlib.sha256(combined.encode()).hexdigest()[:12]
+        self.loaded_at = time.time()
+        self._derived = {}
+        self._lock = threading.Lock()
+
+    def rows(self):
+        return {name: table.rows() for name, table in self.tables.items()}
+
+    def memory_bytes(self):
+        """Rough size of the tables and everything derived from them, used to keep tenants under a memory budget"""
+        with self._lock:
+            derived = list(self._derived.values())
+        return (sum(table.memory_bytes() for table in self.tables.values())
+                + sum(obj.memory_bytes() for obj in derived if hasattr(obj, 'memory_bytes')))
+
+    def derive(self, key, factory):
+        """Build `factory(self)` once per snapshot and keep it for as long as the snapshot lives"""
+        with self._lock:
+            if key not in self._derived:
+                self._derived[key] = factory(self)
+            return self._derived[key]
+
+
+def _ordered(names):
+    return [n for n in TABLE_ORDER if n in names] + sorted(n for n in names if n not in TABLE_ORDER)
+
+
+class DatasetStore:
+    """The live snapshot of one data directory, swapped atomically when its csv files change"""
+
+    def __init__(self, data_dir, snapshot_dir=None):
+        self.data_dir = data_dir
+        self.snapshot_dir = snapshot_dir or os.path.join(data_dir, '.snapshots')
+        self._current = None
+        self._swap_lock = threading.Lock()
+
+    def current(self):
+        """The live snapshot. Grab it once per request so the request sees a consistent dataset"""
+        if self._current is None:
+            self.refresh()
+        return self._current
+
+    def peek(self):
+        """The live snapshot if one is loaded, without loading it"""
+        return self._current
+
+    def _scan(self):
+        files = {}
+        for filename in os.listdir(self.data_dir):
+            if filename.endswith('.csv'):
+                stat = os.stat(os.path.join(self.data_dir, filename))
+                files[filename[:-4]] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def refresh(self):
+        """Load changed csv files and swap in a new snapshot. Returns True if the version changed"""
+        with self._swap_lock:
+            old = self._current
+            files = self._scan()
+            if old is not None and files == old.files:
+                return False
+            if old is not None and any(time.time() - mtime / 1e9 < SETTLE_SECONDS for mtime, _ in files.values()):
+                return False
+
+            tables = {}
+            for name in _ordered(files):
+                if old is not None and old.files.get(name) == files[name]:
+                    tables[name] = old.tables[name]
+                    continue
+                with open(os.path.join(self.data_dir, f"{name}.csv"), encoding='utf-8') as f:
+                    text = f.read()
+                digest = hashlib.sha256(text.encode()).hexdigest()[:16]
+                if old is not None and name in old.tables and old.tables[name].digest == digest:
+                    # Touched but not changed
+                    tables[name] = old.tables[name]
+                else:
+                    tables[name] = TableSnapshot.load(name, text, digest, self.snapshot_dir)
+
+            snapshot = DatasetSnapshot(tables, files)
+            if old is not None and snapshot.version == old.version:
+                old.files = files
+                return False
+            # Requests that already hold the old snapshot keep using it until they finish
+            self._current = snapshot
+            logger.info(f"Dataset version {snapshot.version} loaded from {self.data_dir} "
+                        f"({', '.join(f'{n}={len(t)}' for n, t in tables.items())})")
+            self._prune([snapshot, old])
+            return True
+
+    def _prune(self, keep):
+        """Delete cached tables that none of the `keep` snapshots use (the live one and the one before it)"""
+        used = {_snapshot_name(name, table.digest) for snapshot in keep if snapshot is not None
+                for name, table in snapshot.tables.items()}
+        try:
+            names = os.listdir(self.snapshot_dir)
+        except FileNotFoundError:
+            return
+        for name in names:
+            # Half-written temporary directories may belong to another worker, leave them
+            if SNAPSHOT_NAME.fullmatch(name) and name not in used:
+                logger.debug(f"Removing cached table {name}")
+                # Workers still mapping its files keep them until they let go
+                shutil.rmtree(os.path.join(self.snapshot_dir, name), ignore_errors=True)
+
+    def refresh_quietly(self):
+        try:
+            return self.refresh()
+        except Exception as e:
+            version = self._current.version if self._current else None
+            logger.error(f"Error reloading {self.data_dir}, keeping version {version}: {str(e)}", exc_info=True)
+            return False
+
+
+# The default dataset, used when no tenant is given; tenants.registry polls it for new versions
+store = DatasetStore(DATASET_DIR, SNAPSHOT_DIR)
+
+
+def current():
+    return store.current()
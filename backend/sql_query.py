@@ -0,0 +1,222 @@
+import csv
+import io
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from dataset import PLAIN_TEXT_INSTRUCTION
+from llm import generate
+
+logger = logging.getLogger(__name__)
+
+QUERY_TIMEOUT = float(os.environ.get('SQL_QUERY_TIMEOUT', 2))
+MAX_RESULT_ROWS = int(os.environ.get('SQL_MAX_RESULT_ROWS', 200))
+# SQLite refuses to build a string or blob longer than this, whatever function is asked to
+MAX_VALUE_BYTES = int(os.environ.get('SQL_MAX_VALUE_BYTES', 100000))
+MAX_SQL_LENGTH = int(os.environ.get('SQL_MAX_SQL_LENGTH', 20000))
+# What goes into the answer prompt: each cell, and the csv as a whole
+MAX_CELL_CHARS = int(os.environ.get('SQL_MAX_CELL_CHARS', 500))
+MAX_RESULT_CHARS = int(os.environ.get('SQL_MAX_RESULT_CHARS', 50000))
+SAMPLE_ROWS = 3
+
+SQL_TYPES = {'int': 'INTEGER', 'int_nullable': 'INTEGER', 'float': 'REAL', 'str': 'TEXT'}
+
+# Statements the generated query may run; everything else (writes, ATTACH, PRAGMA...) is denied
+ALLOWED_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+# Functions that only exist to make large values; no question about the CRM data needs them
+DENIED_FUNCTIONS = {'randomblob', 'zeroblob'}
+# printf/format pad to any width; denied when the statement asks for a wide or computed width
+FORMAT_FUNCTIONS = {'printf', 'format'}
+PADDED_FORMAT = re.compile(r"%[-+ 0#,!]*(\d*\.)?(\d{3,}|\*|')")
+
+
+class QueryFailed(Exception):
+    """The generated SQL could not be run against the dataset"""
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _value(value, kind):
+    if kind == 'str':
+        return str(value)
+    if kind == 'int':
+        return int(value)
+    if math.isnan(value):
+        return None
+    return int(value) if kind == 'int_nullable' else float(value)
+
+
+def _authorizer(padded_format=False):
+    """SQLite authorizer callback; for a SQLITE_FUNCTION action the function name is the second argument"""
+    denied = DENIED_FUNCTIONS | FORMAT_FUNCTIONS if padded_format else DENIED_FUNCTIONS
+
+    def authorize(action, arg1, arg2, *args):
+        if action == sqlite3.SQLITE_FUNCTION and (arg2 or '').lower() in denied:
+            return sqlite3.SQLITE_DENY
+        return sqlite3.SQLITE_OK if action in ALLOWED_ACTIONS else sqlite3.SQLITE_DENY
+    return authorize
+
+
+def _clip(value):
+    """A result cell cut to MAX_CELL_CHARS characters"""
+    if isinstance(value, bytes):
+        value = value.hex()
+    if isinstance(value, str) and len(value) > MAX_CELL_CHARS:
+        return value[:MAX_CELL_CHARS] + f"... ({len(value)} characters)"
+    return value
+
+
+class CrmDatabase:
+    """Read-only in-memory SQLite copy of one dataset snapshot"""
+
+    def __init__(self, snapshot):
+        self.conn = sqlite3.connect(':memory:', check_same_thread=False)
+        self.lock = threading.Lock()
+        self.schema = []
+        columns_by_name = {}
+        for name, table in snapshot.tables.items():
+            columns = list(table.columns)
+            for column in columns:
+                columns_by_name.setdefault(column, []).append(name)
+            definition = ", ".join(f"{_quote(c)} {SQL_TYPES[table.kinds[c]]}" for c in columns)
+            statement = f"CREATE TABLE {_quote(name)} ({definition})"
+            self.conn.execute(statement)
+            self.schema.append(statement)
+            placeholders = ", ".join("?" for _ in columns)
+            values = zip(*[[_value(v, table.kinds[c]) for v in table.columns[c]] for c in columns])
+            self.conn.executemany(f"INSERT INTO {_quote(name)} VALUES ({placeholders})", values)
+
+        # Index the join keys (columns shared between tables) and low-cardinality filters
+        for column, tables in columns_by_name.items():
+            if len(tables) > 1 or column in ('deal_stage', 'sector', 'regional_office', 'manager'):
+                for name in tables:
+                    self.conn.execute(f"CREATE INDEX {_quote(f'idx_{name}_{column}')} ON {_quote(name)} ({_quote(column)})")
+        self.conn.commit()
+        # Measured now: once the authorizer is set, PRAGMA is denied
+        page_count = self.conn.execute("PRAGMA page_count").fetchone()[0]
+        self.size_bytes = page_count * self.conn.execute("PRAGMA page_size").fetchone()[0]
+        self.conn.execute("PRAGMA query_only = ON")
+        self.conn.setlimit(sqlite3.SQLITE_LIMIT_LENGTH, MAX_VALUE_BYTES)
+        self.conn.setlimit(sqlite3.SQLITE_LIMIT_SQL_LENGTH, MAX_SQL_LENGTH)
+        self.conn.set_authorizer(_authorizer())
+        self.samples = {name: table.rows()[:SAMPLE_ROWS] for name, table in snapshot.tables.items()}
+
+    def memory_bytes(self):
+        return self.size_bytes
+
+    def run(self, sql):
+        """Run a SELECT with a time limit; returns (column names, rows, truncated)"""
+        deadline = time.monotonic() + QUERY_TIMEOUT
+        with self.lock:
+            # A non-zero return aborts the statement
+            self.conn.set_progress_handler(lambda: int(time.monotonic() > deadline), 10000)
+            self.conn.set_authorizer(_authorizer(bool(PADDED_FORMAT.search(sql))))
+            try:
+                cursor = self.conn.execute(sql)
+                # Cells are clipped as they are fetched, so only one full-size row is held at a time
+                rows = [tuple(_clip(v) for v in row) for row, _ in zip(cursor, range(MAX_RESULT_ROWS + 1))]
+                names = [d[0] for d in cursor.description or []]
+            except sqlite3.Error as e:
+                if time.monotonic() > deadline:
+                    raise QueryFailed(f"query took longer than {QUERY_TIMEOUT}s") from e
+                raise QueryFailed(str(e)) from e
+            finally:
+                self.conn.set_progress_handler(None, 0)
+        return names, rows[:MAX_RESULT_ROWS], len(rows) > MAX_RESULT_ROWS
+
+    def schema_prompt(self):
+        """Table definitions plus a few sample rows, instead of the whole dataset"""
+        parts = []
+        for statement, (name, rows) in zip(self.schema, self.samples.items()):
+            sample = "\n".join(",".join(row.values()) for row in rows)
+            parts.append(f"{statement};\n-- sample rows from {name}:\n{sample}")
+        return "\n\n".join(parts)
+
+
+def database(snapshot):
+    """CrmDatabase for the snapshot, built once per dataset version"""
+    return snapshot.derive('sqlite', CrmDatabase)
+
+
+def extract_sql(text):
+    match = re.search(r'```(?:sql|sqlite)?\s*(.*?)```', text, re.DOTALL | re.IGNORECASE)
+    sql = (match.group(1) if match else text).strip().rstrip(';').strip()
+    if not re.match(r'(?is)^(select|with)\b', sql):
+        raise QueryFailed("model did not return a SELECT query")
+    return sql
+
+
+def query_prompt(user_question, schema, previous=None):
+    prompt = f"""You are an AI assistant writing SQLite queries over a CRM database.
+    Write one SQLite SELECT statement that returns the data needed to answer this question: "{user_question}"
+
+    The database schema is:
+{schema}
+
+Empty values are NULL. Do the arithmetic (counts, sums, averages) in SQL.
+Return only the SQL in a ```sql block.
+"""
+    if previous:
+        sql, error = previous
+        prompt += f"\nYour previous query failed:\n```sql\n{sql}\n```\nError: {error}\nReturn a corrected query.\n"
+    return prompt
+
+
+def results_as_csv(names, rows, truncated):
+    """The result rows as csv for the answer prompt, at most MAX_RESULT_CHARS characters"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(names)
+    for shown, row in enumerate(rows):
+        if output.tell() > MAX_RESULT_CHARS:
+            output.write(f"(only the first {shown} rows are shown)\n")
+            break
+        writer.writerow([_clip(v) for v in row])
+    else:
+        if truncated:
+            output.write(f"(only the first {MAX_RESULT_ROWS} rows are shown)\n")
+    return output.getvalue()
+
+
+def answer_prompt(user_question, sql, results):
+    return f"""You are an AI assistant analyzing a csv dataset of CRM data.
+    Provide a clear and detailed answer in English to the following question: "{user_question}"
+
+    The answer was computed with this query:
+```sql
+{sql}
+```
+    Its exact result is:
+```csv
+{results}```
+Base the answer on this result only; the numbers in it are exact.
+{PLAIN_TEXT_INSTRUCTION}
+"""
+
+
+def answer_with_query(user_question, snapshot, **generate_kwargs):
+    """Have Gemini write SQL from the schema, run it locally and answer from the result rows"""
+    db = database(snapshot)
+    schema = db.schema_prompt()
+    previous = None
+    for attempt in range(2):
+        sql = None
+        try:
+            sql = extract_sql(generate(query_prompt(user_question, schema, previous), **generate_kwargs))
+            names, rows, truncated = db.run(sql)
+            break
+        except QueryFailed as e:
+            logger.warning(f"Generated query failed (attempt {attempt + 1}): {e}")
+            if attempt == 1:
+                raise
+            previous = (sql or "", str(e))
+
+    logger.debug(f"Query returned {len(rows)} rows: {sql}")
+    answer = generate(answer_prompt(user_question, sql, results_as_csv(names, rows, truncated)), **generate_kwargs)
+    return answer, sql
@@ -0,0 +1,189 @@
+import bisect
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+
+import snapshots
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TENANT = 'default'
+# One sub-directory of csv files per tenant; the default tenant uses DATASET_DIR itself
+TENANTS_DIR = os.environ.get('TENANTS_DIR', os.path.join(snapshots.DATASET_DIR, 'tenants'))
+TENANT_IDLE_SECONDS = float(os.environ.get('TENANT_IDLE_SECONDS', 1800))
+TENANT_MEMORY_MB = float(os.environ.get('TENANT_MEMORY_MB', 512))
+
+# Tenant-affine routing between serving nodes, e.g. TENANT_NODES=http://10.0.0.1:8080,http://10.0.0.2:8080
+TENANT_NODES = [n.strip().rstrip('/') for n in os.environ.get('TENANT_NODES', '').split(',') if n.strip()]
+SELF_NODE = os.environ.get('SELF_NODE', '').rstrip('/')
+TENANT_REPLICAS = int(os.environ.get('TENANT_REPLICAS', 1))
+
+TENANT_ID = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+class UnknownTenant(Exception):
+    """No dataset exists for the requested tenant"""
+
+
+class Tenant:
+    """A tenant's dataset plus the per-tenant state that should stay hot in this worker"""
+
+    def __init__(self, tenant_id, store):
+        self.id = tenant_id
+        self.store = store
+        self.last_used = time.monotonic()
+        # Per-tenant objects such as the conversation chain and its vector store
+        self.state = {}
+
+    def snapshot(self):
+        self.last_used = time.monotonic()
+        return self.store.current()
+
+    def memory_bytes(self):
+        """The dataset with its derived indexes, plus the tenant's vector store"""
+        snapshot = self.store.peek()
+        total = snapshot.memory_bytes() if snapshot is not None else 0
+        index = getattr(self.state.get('vectorstore'), 'index', None)
+        if index is not None:
+            # FAISS flat index: one float32 vector per chunk
+            total += index.ntotal * index.d * 4
+        return total
+
+
+class TenantRegistry:
+    """
+    Lazily loads tenants on first use and evicts them again when they sit idle
+    or when the loaded tenants together go over the memory budget (least
+    recently used first). The default tenant is never evicted.
+    """
+
+    def __init__(self, tenants_dir=TENANTS_DIR, idle_seconds=TENANT_IDLE_SECONDS, memory_budget_mb=TENANT_MEMORY_MB):
+        self.tenants_dir = tenants_dir
+        self.idle_seconds = idle_seconds
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self._tenants = {DEFAULT_TENANT: Tenant(DEFAULT_TENANT, snapshots.store)}
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._evictions = 0
+        self._on_evict = []
+
+    def get(self, tenant_id=None):
+        tenant_id = tenant_id or DEFAULT_TENANT
+        with self._lock:
+            tenant = self._tenants.get(tenant_id)
+        if tenant is None:
+            if not TENANT_ID.match(tenant_id):
+                raise UnknownTenant(f"Invalid tenant id: {tenant_id}")
+            data_dir = os.path.join(self.tenants_dir, tenant_id)
+            if not os.path.isdir(data_dir):
+                raise UnknownTenant(f"Unknown tenant: {tenant_id}")
+            with self._lock:
+                tenant = self._tenants.setdefault(tenant_id, Tenant(tenant_id, snapshots.DatasetStore(data_dir)))
+            logger.info(f"Loading tenant {tenant_id}")
+        # Load outside the registry lock so one slow tenant does not block the others
+        tenant.snapshot()
+        self.evict(keep=tenant_id)
+        return tenant
+
+    def evict(self, keep=None):
+        """Drop idle tenants, then the least recently used ones until we are under the memory budget"""
+        now = time.monotonic()
+        evicted = []
+        with self._lock:
+            candidates = sorted((t for t in self._tenants.values() if t.id not in (DEFAULT_TENANT, keep)),
+                                key=lambda t: t.last_used)
+            total = sum(t.memory_bytes() for t in self._tenants.values())
+            for tenant in candidates:
+                idle = now - tenant.last_used > self.idle_seconds
+                if not idle and total <= self.memory_budget:
+                    break
+                # Requests still holding its snapshot keep it alive until they finish
+                total -= tenant.memory_bytes()
+                del self._tenants[tenant.id]
+                self._evictions += 1
+                evicted.append(tenant.id)
+                logger.info(f"Evicted tenant {tenant.id} ({'idle' if idle else 'memory budget'})")
+        for tenant_id in evicted:
+            for callback in self._on_evict:
+                callback(tenant_id)
+
+    def on_evict(self, callback):
+        """Call `callback(tenant_id)` after a tenant is evicted, to drop state kept outside the registry"""
+        self._on_evict.append(callback)
+
+    def loaded(self):
+        with self._lock:
+            return list(self._tenants.values())
+
+    def _watch(self):
+        while True:
+            time.sleep(snapshots.POLL_SECONDS)
+            for tenant in self.loaded():
+                tenant.store.refresh_quietly()
+            self.evict()
+
+    def start(self):
+        """Load the default dataset and keep every loaded tenant up to date in the background"""
+        self.get(DEFAULT_TENANT)
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, name='tenant-watcher', daemon=True)
+            self._watcher.start()
+
+    def stats(self):
+        now = time.monotonic()
+        tenants = self.loaded()
+        return {
+            'memory_budget_mb': self.memory_budget / 1024 / 1024,
+            'evictions': self._evictions,
+            'tenants': {
+                t.id: {
+                    'version': t.store.peek().version if t.store.peek() else None,
+                    'memory_mb': round(t.memory_bytes() / 1024 / 1024, 3),
+                    'idle_seconds': round(now - t.last_used, 1),
+                } for t in tenants
+            },
+        }
+
+
+class HashRing:
+    """Consistent hashing of tenants onto serving nodes, with virtual nodes to even out the load"""
+
+    def __init__(self, nodes, vnodes=100):
+        self.nodes = list(nodes)
+        self._ring = sorted((self._hash(f"{node}#{i}"), node) for node in self.nodes for i in range(vnodes))
+        self._keys = [key for key, _ in self._ring]
+
+    @staticmethod
+    def _hash(value):
+        return int(hashlib.md5(value.encode()).hexdigest()[:16], 16)
+
+    def nodes_for(self, tenant_id, replicas=1):
+        """The `replicas` distinct nodes that own this tenant, preferred node first"""
+        if not self._ring:
+            return []
+        owners = []
+        index = bisect.bisect(self._keys, self._hash(tenant_id))
+        for offset in range(len(self._ring)):
+            node = self._ring[(index + offset) % len(self._ring)][1]
+            if node not in owners:
+                owners.append(node)
+                if len(owners) == min(replicas, len(self.nodes)):
+                    break
+        return owners
+
+
+registry = TenantRegistry()
+ring = HashRing(TENANT_NODES)
+
+
+def owner_nodes(tenant_id):
+    """Nodes that should serve this tenant; empty when routing is not configured"""
+    return ring.nodes_for(tenant_id or DEFAULT_TENANT, TENANT_REPLICAS)
+
+
+def is_local(tenant_id):
+    owners = owner_nodes(tenant_id)
+    return not owners or not SELF_NODE or SELF_NODE in owners
@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import snapshots  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def crm_snapshot(tmp_path_factory):
+    """The csv dataset shipped in data/, with its column cache in a temporary directory"""
+    store = snapshots.DatasetStore(os.path.join(BACKEND_DIR, 'data'), str(tmp_path_factory.mktemp('snapshots')))
+    return store.current()
@@ -0,0 +1,57 @@
+import time
+
+from answer_cache import AnswerCache, QuestionLog, normalize_question
+
+
+def test_questions_are_normalized():
+    assert normalize_question("  How many   Deals? ") == normalize_question("how many deals")
+
+
+def test_entries_expire():
+    cache = AnswerCache(ttl=0.05)
+    cache.put('t', 'v1', 'prompt', "q", {'answer': 1})
+    assert cache.get('t', 'v1', 'prompt', "Q?") == {'answer': 1}
+    assert cache.get('t', 'v2', 'prompt', "q") is None
+    time.sleep(0.06)
+    assert cache.get('t', 'v1', 'prompt', "q") is None
+
+
+def test_least_recently_used_entries_are_dropped():
+    cache = AnswerCache(max_entries=2)
+    cache.put('t', 'v', 'prompt', "a", 1)
+    cache.put('t', 'v', 'prompt', "b", 2)
+    cache.get('t', 'v', 'prompt', "a")
+    cache.put('t', 'v', 'prompt', "c", 3)
+    assert cache.contains('t', 'v', 'prompt', "a")
+    assert not cache.contains('t', 'v', 'prompt', "b")
+
+
+def test_refresh_resets_hits():
+    cache = AnswerCache(ttl=1)
+    cache.put('t', 'v', 'prompt', "q", 1)
+    for _ in range(3):
+        cache.get('t', 'v', 'prompt', "q")
+    assert cache.expiring(within=2, min_hits=3) == [('t', 'v', 'prompt', "q")]
+
+    # Once refreshed, it has to earn its hits again within the new TTL
+    cache.put('t', 'v', 'prompt', "q", 2, refreshed=True)
+    assert cache.expiring(within=2, min_hits=3) == []
+    assert cache.stats()['refreshed'] == 1
+
+
+def test_question_log_is_rotated_past_its_size(tmp_path):
+    path = tmp_path / 'questions.jsonl'
+    log = QuestionLog(str(path), max_bytes=2000)
+    for i in range(100):
+        log.record('acme', f"question {i % 3}", 'prompt')
+    log.record('other', "Question 0?", 'prompt')
+
+    assert path.stat().st_size <= 2000 + 200
+    assert (tmp_path / 'questions.jsonl.1').stat().st_size <= 2000 + 200
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['questions.jsonl', 'questions.jsonl.1']
+    # Both files are counted, the oldest questions are gone
+    kept = sum(1 for name in ('questions.jsonl', 'questions.jsonl.1') for _ in open(tmp_path / name))
+    assert 10 < kept < 101
+    assert sorted(log.top('acme', 5)) == [('question 0', 'prompt'), ('question 1', 'prompt'), ('question 2', 'prompt')]
+    assert log.top('other', 5) == [('Question 0?', 'prompt')]
+    assert QuestionLog(str(tmp_path / 'missing.jsonl')).top('acme', 5) == []
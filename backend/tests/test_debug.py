@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+import debug
+
+TOKEN = {'X-Debug-Token': 'secret'}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(debug, 'DEBUG_TOKEN', 'secret')
+    monkeypatch.setattr(debug, 'profiler', debug.Profiler())
+    app = Flask(__name__)
+    debug.register_debug_routes(app)
+    return app.test_client()
+
+
+def test_routes_do_not_exist_without_a_token(monkeypatch):
+    monkeypatch.setattr(debug, 'DEBUG_TOKEN', '')
+    app = Flask(__name__)
+    debug.register_debug_routes(app)
+    assert app.test_client().get('/api/debug/profile', headers=TOKEN).status_code == 404
+
+
+def test_routes_require_the_token(client):
+    assert client.get('/api/debug/profile').status_code == 403
+    assert client.post('/api/debug/memory/start', headers={'X-Debug-Token': 'wrong'}).status_code == 403
+
+
+def busy_request_handler(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_profile_runs_in_the_background(client):
+    stop = threading.Event()
+    threading.Thread(target=busy_request_handler, args=(stop,), name='handler', daemon=True).start()
+    try:
+        assert client.get('/api/debug/profile', headers=TOKEN).status_code == 404
+        assert client.post('/api/debug/profile?seconds=0.3&thread=handler', headers=TOKEN).status_code == 202
+        # The request returns right away and the profile cannot be started twice
+        assert client.get('/api/debug/profile', headers=TOKEN).status_code == 202
+        assert client.post('/api/debug/profile?seconds=0.3', headers=TOKEN).status_code == 409
+        time.sleep(0.5)
+    finally:
+        stop.set()
+
+    response = client.get('/api/debug/profile', headers=TOKEN)
+    assert response.status_code == 200
+    lines = response.get_data(as_text=True).splitlines()
+    assert lines and all(line.startswith('handler;') for line in lines)
+    assert 'busy_request_handler' in lines[0]
+
+
+def test_memory_snapshots_are_diffed(client):
+    assert client.get('/api/debug/memory', headers=TOKEN).status_code == 409
+    client.post('/api/debug/memory/start', headers=TOKEN)
+    try:
+        first = client.get('/api/debug/memory', headers=TOKEN).get_json()
+        assert first['compared'] is False
+        kept = [bytearray(100000) for _ in range(10)]
+        second = client.get('/api/debug/memory?limit=5', headers=TOKEN).get_json()
+        assert second['compared'] is True
+        assert any(entry['size_diff_kb'] >= 900 for entry in second['top'])
+        del kept
+    finally:
+        client.post('/api/debug/memory/stop', headers=TOKEN)
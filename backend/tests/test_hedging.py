@@ -0,0 +1,84 @@
+import threading
+import time
+
+import pytest
+
+from hedging import Hedger
+
+
+def call(first_token_after, value):
+    """An upstream call that streams its first token after a delay"""
+    def fn(attempt):
+        attempt.started()
+        time.sleep(first_token_after)
+        attempt.first_token()
+        if attempt.cancelled.is_set():
+            return None
+        return value
+    return fn
+
+
+def failing(attempt):
+    attempt.started()
+    raise RuntimeError("upstream failed")
+
+
+def test_fast_primary_is_not_hedged():
+    hedger = Hedger(default_deadline=0.5)
+    assert hedger.run(call(0.01, 'primary'), call(0.01, 'hedge')) == 'primary'
+    assert hedger.stats()['hedges_fired'] == 0
+
+
+def test_slow_primary_is_hedged_and_the_hedge_wins():
+    hedger = Hedger(default_deadline=0.05)
+    started = time.monotonic()
+    assert hedger.run(call(0.6, 'primary'), call(0.01, 'hedge')) == 'hedge'
+    assert time.monotonic() - started < 0.4
+    stats = hedger.stats()
+    assert stats['hedges_fired'] == 1 and stats['hedge_wins'] == 1
+
+    # The cancelled primary still reports its first token, which gives the time saved
+    time.sleep(0.8)
+    assert hedger.stats()['saved_seconds'] == pytest.approx(0.5, abs=0.1)
+    # Recording it needed no thread of its own; the primary's thread is done as well
+    assert not [t for t in threading.enumerate() if t.name.startswith('llm-')]
+
+
+def test_primary_can_still_win_after_a_hedge():
+    hedger = Hedger(default_deadline=0.05)
+    assert hedger.run(call(0.1, 'primary'), call(0.5, 'hedge')) == 'primary'
+    assert hedger.stats()['hedge_wins'] == 0
+
+
+def test_hedges_are_limited_by_the_budget():
+    hedger = Hedger(default_deadline=0.01, max_ratio=0.0)
+    for _ in range(3):
+        assert hedger.run(call(0.05, 'primary'), call(0.01, 'hedge')) in ('primary', 'hedge')
+    stats = hedger.stats()
+    # The starting budget pays for one hedge and nothing refills it
+    assert stats['hedges_fired'] == 1
+    assert stats['budget_denied'] == 2
+
+
+def test_errors_without_a_token_are_raised():
+    hedger = Hedger(default_deadline=1.0)
+    with pytest.raises(RuntimeError, match="upstream failed"):
+        hedger.run(failing, call(0.01, 'hedge'))
+
+
+def test_deadline_follows_the_latency_percentile():
+    hedger = Hedger(percentile=90, default_deadline=3.0, min_samples=10)
+    assert hedger.deadline() == 3.0
+    for i in range(1, 11):
+        hedger.record_first_token(i / 10)
+    assert hedger.deadline() == pytest.approx(0.9)
+
+
+def test_stats_report_hedging_used_without_the_default(monkeypatch):
+    import hedging
+    monkeypatch.setattr(hedging, 'HEDGING_ENABLED', False)
+    hedger = Hedger(default_deadline=0.5)
+    assert hedger.stats()['enabled'] is False
+    hedger.run(call(0.01, 'primary'), call(0.01, 'hedge'))
+    stats = hedger.stats()
+    assert stats['enabled'] is True and stats['enabled_by_default'] is False
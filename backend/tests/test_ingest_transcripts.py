@@ -0,0 +1,91 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip('langchain.text_splitter')
+pytest.importorskip('langchain_community.vectorstores')
+pytest.importorskip('faiss')
+
+from langchain_core.embeddings import Embeddings  # noqa: E402
+
+import ingest_transcripts  # noqa: E402
+from ingest_transcripts import MANIFEST, ingest, read_manifest, remove_orphan_shards  # noqa: E402
+from transcripts import SHARDS_DIR  # noqa: E402
+
+
+class StubEmbeddings(Embeddings):
+    """Tiny deterministic vectors; any text containing BOOM fails to embed"""
+
+    def embed_documents(self, texts):
+        if any('BOOM' in text for text in texts):
+            raise RuntimeError("embedding failed")
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), float(sum(map(ord, text)) % 97), 1.0]
+
+
+def write_transcript(directory, name, text):
+    path = directory / f"{name}.json"
+    path.write_text(json.dumps([{'text': text, 'start': 1.0, 'duration': 2.0},
+                                {'text': f"more about {name}", 'start': 3.5, 'duration': 2.0}]))
+    return str(path)
+
+
+def run(paths, index_dir):
+    return ingest(paths, str(index_dir), workers=1, files_per_shard=1, make_embeddings=StubEmbeddings)
+
+
+def manifest_paths(index_dir):
+    return {json.loads(line)['path'] for line in (index_dir / MANIFEST).read_text().splitlines()}
+
+
+def test_read_manifest_skips_half_written_lines(tmp_path):
+    (tmp_path / MANIFEST).write_text(
+        json.dumps({'path': '/a.json', 'shard': 's1'}) + "\n"
+        + json.dumps({'path': '/b.json', 'shard': None}) + "\n"
+        + '{"path": "/c.js')
+    assert read_manifest(str(tmp_path)) == ({'/a.json', '/b.json'}, {'s1'})
+    assert read_manifest(str(tmp_path / 'missing')) == (set(), set())
+
+
+def test_remove_orphan_shards(tmp_path):
+    shards_dir = tmp_path / SHARDS_DIR
+    for name in ('kept', 'orphan', '.tmp-half'):
+        (shards_dir / name).mkdir(parents=True)
+    remove_orphan_shards(str(tmp_path), {'kept'})
+    assert os.listdir(shards_dir) == ['kept']
+
+
+def test_rerun_only_ingests_what_is_not_recorded(tmp_path):
+    paths = [write_transcript(tmp_path, f"video{i}", f"transcript number {i}") for i in range(4)]
+    index_dir = tmp_path / 'index'
+
+    files, chunks, failed = run(paths[:2], index_dir)
+    assert (files, failed) == (2, []) and chunks >= 2
+    assert manifest_paths(index_dir) == set(paths[:2])
+
+    files, _, failed = run(paths, index_dir)
+    assert (files, failed) == (2, [])
+    assert manifest_paths(index_dir) == set(paths)
+    assert len(os.listdir(index_dir / SHARDS_DIR)) == 4
+
+    assert run(paths, index_dir) == (0, 0, [])
+
+
+def test_failed_groups_are_left_out_of_the_manifest(tmp_path):
+    good = write_transcript(tmp_path, 'good', "all fine here")
+    bad = write_transcript(tmp_path, 'bad', "this one goes BOOM")
+    broken = tmp_path / 'broken.json'
+    broken.write_text('{"not": "a transcript"}')
+    index_dir = tmp_path / 'index'
+
+    files, _, failed = run([good, bad, str(broken)], index_dir)
+    assert files == 1
+    assert sorted(failed) == sorted([bad, str(broken)])
+    assert manifest_paths(index_dir) == {good}
+    assert os.listdir(index_dir / SHARDS_DIR) == [ingest_transcripts.shard_id([good])]
+
+    # The next run tries the failed files again
+    assert run([good, bad, str(broken)], index_dir)[2] == failed
@@ -0,0 +1,71 @@
+import pytest
+
+from local_answers import LocalAnswerer
+
+
+@pytest.fixture(scope='module')
+def answerer(crm_snapshot):
+    return LocalAnswerer(crm_snapshot.rows())
+
+
+def deals(snapshot, **where):
+    return [r for r in snapshot.rows()['sales_pipeline'] if all(r[k] == v for k, v in where.items())]
+
+
+@pytest.mark.parametrize('question', [
+    # negation
+    "How many deals are not won?",
+    "How many deals weren't lost?",
+    # dates and numbers
+    "How many deals were closed in 2017?",
+    "How many deals have a close value over 1000?",
+    "What is the total close value of deals closed in March?",
+    # comparatives and superlatives
+    "Which sales agents have the highest total close value?",
+    "What is the total close value of the biggest deals?",
+    "How many deals are worth more than GTX Pro?",
+    # which / who / list
+    "Which accounts bought GTX Basic?",
+    "Who is the manager of Anna Snelling?",
+    "List the deals for Isdom",
+    # verbs that are not a deal stage
+    "How many deals did Moses Frase close?",
+    "How many deals did Darcel Schlecht engage?",
+    # a second field of a related entity
+    "What is the revenue of Cheers's parent company?",
+    # several entities of one kind
+    "How many deals for GTX Pro and MG Special?",
+    # unknown qualifiers
+    "How many deals in the medical sector?",
+    "What is the price of GTX Pro in euros?",
+])
+def test_unsupported_questions_go_to_the_llm(answerer, question):
+    assert answerer.answer(question) is None
+
+
+def test_counts_deals_by_stage(answerer, crm_snapshot):
+    assert answerer.answer("How many won deals are there?") == \
+        f"There are {len(deals(crm_snapshot, deal_stage='Won'))} won deals in the dataset."
+
+
+def test_stage_verbs_filter_the_count(answerer, crm_snapshot):
+    lost = deals(crm_snapshot, sales_agent='Moses Frase', deal_stage='Lost')
+    assert len(lost) < len(deals(crm_snapshot, sales_agent='Moses Frase'))
+    assert answerer.answer("How many deals did Moses Frase lose?") == \
+        f"There are {len(lost)} lost deals by Moses Frase in the dataset."
+
+
+def test_total_close_value_for_an_agent(answerer, crm_snapshot):
+    rows = deals(crm_snapshot, sales_agent='Darcel Schlecht')
+    total = sum(int(r['close_value']) for r in rows if r['close_value'])
+    assert answerer.answer("What is the total close value of deals by Darcel Schlecht?") == \
+        f"The total close value of deals by Darcel Schlecht is {total} ({len(rows)} deals in the dataset)."
+
+
+def test_lookups(answerer):
+    assert answerer.answer("What is the price of GTX Pro?") == "The sales price of GTX Pro is 4821."
+    assert answerer.answer("What is the manager of Anna Snelling?") == "Anna Snelling's manager is Dustin Brinkmann."
+    assert answerer.answer("What office does Anna Snelling work in?") == \
+        "Anna Snelling works in the Central regional office."
+    assert answerer.answer("What is the revenue of Acme Corporation?") == "Acme Corporation has a revenue of 1100.04."
+    assert answerer.answer("How many employees does Betasoloin have?") == "Betasoloin has 495 employees."
@@ -0,0 +1,88 @@
+import datetime
+import gzip
+import json
+
+import pytest
+from flask import Flask, jsonify
+from flask.json.provider import DefaultJSONProvider
+
+import responses
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    responses.init_app(app)
+
+    @app.route('/small')
+    def small():
+        return jsonify({'b': 1, 'a': 2})
+
+    @app.route('/big')
+    def big():
+        return jsonify({'rows': [{'text': 'word ' * 10, 'start': i} for i in range(100)]})
+
+    @app.route('/transcript')
+    def transcript():
+        return responses.cacheable_json([{'text': 'hello ' * 10, 'start': i} for i in range(100)])
+
+    @app.route('/versioned/<version>')
+    def versioned(version):
+        return responses.cacheable_json({'version': version, 'served_by': id(object())}, etag=version)
+
+    return app
+
+
+def test_keys_are_sorted_like_flask_does(app):
+    payload = {'b': 1, 'a': {'d': datetime.date(2024, 1, 2), 'c': [1.5, None, "é"]}}
+    with app.app_context():
+        fast = app.json.dumps(payload)
+        default = DefaultJSONProvider(app).dumps(payload)
+    assert json.loads(fast) == json.loads(default)
+    assert list(json.loads(fast)) == ['a', 'b']
+    assert app.test_client().get('/small').get_data() == b'{"a":2,"b":1}\n'
+
+
+def test_small_responses_are_not_compressed(app):
+    response = app.test_client().get('/small', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_large_responses_are_compressed_when_accepted(app):
+    client = app.test_client()
+    plain = client.get('/big')
+    assert 'Content-Encoding' not in plain.headers
+
+    compressed = client.get('/big', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert gzip.decompress(compressed.get_data()) == plain.get_data()
+
+
+@pytest.mark.skipif(responses.brotli is None, reason="brotli is not installed")
+def test_brotli_is_preferred_when_available(app):
+    response = app.test_client().get('/big', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert responses.brotli.decompress(response.get_data()) == app.test_client().get('/big').get_data()
+
+
+def test_unchanged_payloads_get_a_304(app):
+    client = app.test_client()
+    first = client.get('/transcript', headers={'Accept-Encoding': 'gzip'})
+    etag = first.headers['ETag']
+    assert etag.startswith('W/')
+    assert 'no-cache' in first.headers['Cache-Control']
+
+    again = client.get('/transcript', headers={'If-None-Match': etag, 'Accept-Encoding': 'br'})
+    assert again.status_code == 304
+    assert again.get_data() == b''
+    assert client.get('/transcript', headers={'If-None-Match': 'W/"other"'}).status_code == 200
+
+
+def test_a_given_etag_replaces_the_body_hash(app):
+    client = app.test_client()
+    first = client.get('/versioned/abc')
+    assert first.headers['ETag'] == 'W/"abc"'
+    # Bodies that differ in something besides the version still match
+    assert client.get('/versioned/abc', headers={'If-None-Match': 'W/"abc"'}).status_code == 304
+    assert client.get('/versioned/def', headers={'If-None-Match': 'W/"abc"'}).status_code == 200
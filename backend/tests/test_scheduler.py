@@ -0,0 +1,105 @@
+import threading
+import time
+
+import pytest
+
+from scheduler import LLMScheduler, QuotaExceeded, TokenBucket, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, process_count
+
+
+def test_token_bucket_waits_for_demand_beyond_one_bucket():
+    bucket = TokenBucket(per_minute=60)
+    now = time.monotonic()
+    assert bucket.time_until(60, now) == 0
+    assert bucket.time_until(180, now) == pytest.approx(120)
+    # A single request bigger than the bucket only waits for a full bucket
+    bucket.take(1000)
+    assert bucket.tokens == 0
+
+
+def test_expected_wait_counts_the_whole_queue():
+    scheduler = LLMScheduler(rpm=2, tpm=10 ** 9, max_queue=50, max_wait=1000)
+    scheduler._queue = [(PRIORITY_INTERACTIVE, i, 1) for i in range(10)]
+    # 11 requests at 2 per minute with a full bucket of 2: 9 more refills of 30s
+    assert scheduler._expected_wait(PRIORITY_INTERACTIVE, 1, time.monotonic()) == pytest.approx(270, rel=0.01)
+    scheduler.max_wait = 60
+    with pytest.raises(QuotaExceeded):
+        scheduler.submit(lambda: None, 1)
+
+
+def wait_for_queue(scheduler, depth, timeout=2):
+    deadline = time.monotonic() + timeout
+    while len(scheduler._queue) < depth:
+        assert time.monotonic() < deadline, "requests never queued"
+        time.sleep(0.01)
+
+
+def test_background_work_does_not_shed_interactive_requests():
+    scheduler = LLMScheduler(rpm=600, tpm=10 ** 9, max_queue=4, max_wait=60)
+    # Nothing can be sent for about half a second, so requests queue up
+    scheduler.requests.tokens = -4
+    results = []
+    threads = []
+    for depth, priority in enumerate((PRIORITY_BACKGROUND, PRIORITY_BACKGROUND,
+                                      PRIORITY_INTERACTIVE, PRIORITY_INTERACTIVE), 1):
+        thread = threading.Thread(target=lambda p=priority: results.append(scheduler.submit(lambda: p, 1, p)))
+        thread.start()
+        threads.append(thread)
+        wait_for_queue(scheduler, depth)
+
+    # The queue holds max_queue entries, but only two of them are interactive
+    assert scheduler.submit(lambda: 'interactive', 1, PRIORITY_INTERACTIVE) == 'interactive'
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == [PRIORITY_INTERACTIVE] * 2 + [PRIORITY_BACKGROUND] * 2
+
+
+def test_background_requests_are_shed_when_the_queue_is_full():
+    scheduler = LLMScheduler(rpm=600, tpm=10 ** 9, max_queue=2, max_wait=60)
+    scheduler.requests.tokens = -4
+    thread = threading.Thread(target=scheduler.submit, args=(lambda: None, 1, PRIORITY_BACKGROUND))
+    thread.start()
+    wait_for_queue(scheduler, 1)
+    with pytest.raises(QuotaExceeded) as error:
+        scheduler.submit(lambda: None, 1, PRIORITY_BACKGROUND)
+    assert error.value.retry_after >= 1
+    thread.join()
+    assert scheduler.stats()['rejected'] == 1
+
+
+def test_requests_that_would_wait_too_long_are_shed():
+    scheduler = LLMScheduler(rpm=1, tpm=10 ** 9, max_wait=5)
+    scheduler.requests.drain(30)
+    with pytest.raises(QuotaExceeded) as error:
+        scheduler.submit(lambda: None, 1)
+    assert error.value.retry_after >= 30
+
+
+class ResourceExhausted(Exception):
+    pass
+
+
+def test_upstream_throttling_becomes_quota_exceeded():
+    scheduler = LLMScheduler(rpm=60, tpm=10 ** 9, max_wait=10)
+
+    def throttled():
+        raise ResourceExhausted("429")
+
+    with pytest.raises(QuotaExceeded):
+        scheduler.submit(throttled, 1)
+    assert scheduler.stats()['upstream_throttled'] == 1
+    # Sending is paused for a while afterwards
+    assert scheduler.requests.time_until(1) > 0
+
+
+def test_budgets_are_split_across_processes():
+    scheduler = LLMScheduler(rpm=60, tpm=1200, processes=4)
+    assert scheduler.requests.rate * 60 == pytest.approx(15)
+    assert scheduler.tokens.capacity == pytest.approx(300)
+    assert scheduler.stats()['rpm'] == 15 and scheduler.stats()['processes'] == 4
+
+
+def test_process_count():
+    assert process_count({}) == 1
+    assert process_count({'WEB_CONCURRENCY': '4'}) == 4
+    assert process_count({'WEB_CONCURRENCY': '4', 'TENANT_NODES': 'http://a, http://b,'}) == 8
+    assert process_count({'GEMINI_PROCESSES': '3', 'WEB_CONCURRENCY': '4'}) == 3
@@ -0,0 +1,96 @@
+import os
+import time
+
+import pytest
+
+import snapshots
+from snapshots import DatasetStore, _column_kind
+
+
+@pytest.mark.parametrize('values, kind', [
+    (['1', '42', '-7'], 'int'),
+    (['1', '', '3'], 'int_nullable'),
+    (['1.5', '2', '1100.04'], 'float'),
+    (['0042', '0100'], 'str'),
+    (['0.50', '1.5'], 'str'),
+    (['nan', '1'], 'str'),
+    (['inf'], 'str'),
+    (['1e3', '2'], 'str'),
+    (['+5'], 'str'),
+    (['1_000'], 'str'),
+    (['-0'], 'str'),
+    (['12345678901234567890'], 'str'),
+    (['', ''], 'str'),
+])
+def test_column_kind(values, kind):
+    assert _column_kind(values) == kind
+
+
+def write_csv(directory, name, text, age=10):
+    path = os.path.join(directory, f"{name}.csv")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    # Older than SETTLE_SECONDS, so the store does not wait for it to finish writing
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+
+
+def test_rows_read_back_as_the_csv_text(tmp_path):
+    data = tmp_path / 'data'
+    data.mkdir()
+    write_csv(data, 'items', "id,price,qty,note\n0042,1.5,3,a\n0100,2,,b\n")
+    rows = DatasetStore(str(data), str(tmp_path / 'cache')).current().rows()['items']
+    assert rows == [{'id': '0042', 'price': '1.5', 'qty': '3', 'note': 'a'},
+                    {'id': '0100', 'price': '2', 'qty': '', 'note': 'b'}]
+
+
+def test_reload_swaps_the_snapshot_and_keeps_the_old_one_intact(tmp_path):
+    data = tmp_path / 'data'
+    data.mkdir()
+    write_csv(data, 'items', "id,name\n1,a\n", age=20)
+    write_csv(data, 'other', "x\n1\n", age=20)
+    store = DatasetStore(str(data), str(tmp_path / 'cache'))
+    old = store.current()
+
+    assert store.refresh() is False
+    write_csv(data, 'items', "id,name\n1,a\n2,b\n")
+    assert store.refresh() is True
+
+    new = store.current()
+    assert new.version != old.version
+    assert [r['name'] for r in new.rows()['items']] == ['a', 'b']
+    assert [r['name'] for r in old.rows()['items']] == ['a']
+    # Unchanged tables are shared between versions
+    assert new.tables['other'] is old.tables['other']
+
+
+def test_files_still_being_written_are_not_loaded(tmp_path):
+    data = tmp_path / 'data'
+    data.mkdir()
+    write_csv(data, 'items', "id\n1\n")
+    store = DatasetStore(str(data), str(tmp_path / 'cache'))
+    version = store.current().version
+    write_csv(data, 'items', "id\n1\n2\n", age=-snapshots.SETTLE_SECONDS)
+    assert store.refresh() is False
+    assert store.current().version == version
+
+
+def test_cached_tables_of_old_versions_are_removed(tmp_path):
+    data, cache = tmp_path / 'data', tmp_path / 'cache'
+    data.mkdir()
+    write_csv(data, 'items', "id\n1\n", age=20)
+    write_csv(data, 'other', "x\n1\n", age=20)
+    store = DatasetStore(str(data), str(cache))
+    first = store.current()
+    (cache / 'items-0123456789abcdef-v1').mkdir()
+
+    for age, text in ((15, "id\n1\n2\n"), (10, "id\n1\n2\n3\n")):
+        write_csv(data, 'items', text, age=age)
+        assert store.refresh() is True
+    # The live and the previous version of items are kept, the first one and old formats are gone
+    items = sorted(name for name in os.listdir(cache) if name.startswith('items-'))
+    assert len(items) == 2
+    assert not any(name.endswith('-v1') for name in items)
+    assert len([name for name in os.listdir(cache) if name.startswith('other-')]) == 1
+    # Snapshots still held by requests keep working
+    assert [r['id'] for r in first.rows()['items']] == ['1']
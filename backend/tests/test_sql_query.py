@@ -0,0 +1,114 @@
+import time
+
+import pytest
+
+import sql_query
+from sql_query import QueryFailed, database, extract_sql, results_as_csv
+
+
+@pytest.fixture(scope='module')
+def db(crm_snapshot):
+    return database(crm_snapshot)
+
+
+def count(db, table):
+    return db.run(f"SELECT COUNT(*) FROM {table}")[1][0][0]
+
+
+def test_select_and_join(db, crm_snapshot):
+    names, rows, truncated = db.run(
+        "SELECT p.series, COUNT(*) FROM sales_pipeline s JOIN products p ON p.product = s.product GROUP BY p.series")
+    assert names == ['series', 'COUNT(*)']
+    assert rows and not truncated
+    assert count(db, 'sales_pipeline') == len(crm_snapshot.rows()['sales_pipeline'])
+
+
+@pytest.mark.parametrize('sql', [
+    "DELETE FROM accounts",
+    "UPDATE products SET sales_price = 0",
+    "INSERT INTO products VALUES ('x', 'y', 1)",
+    "WITH doomed AS (SELECT account FROM accounts) DELETE FROM accounts WHERE account IN doomed",
+    "DROP TABLE products",
+    "CREATE TABLE extra (a)",
+    "CREATE TEMP TABLE extra (a)",
+    "ALTER TABLE products ADD COLUMN x",
+    "PRAGMA query_only = OFF",
+    "PRAGMA table_info(accounts)",
+    "VACUUM",
+    "SELECT 1; DELETE FROM accounts",
+])
+def test_writes_and_pragmas_are_denied(db, sql):
+    before = {table: count(db, table) for table in ('accounts', 'products')}
+    with pytest.raises(QueryFailed):
+        db.run(sql)
+    assert {table: count(db, table) for table in ('accounts', 'products')} == before
+    assert db.run("SELECT sales_price FROM products WHERE sales_price = 0")[1] == []
+
+
+def test_attach_is_denied(db, tmp_path):
+    target = tmp_path / 'other.db'
+    with pytest.raises(QueryFailed):
+        db.run(f"ATTACH DATABASE '{target}' AS other")
+    assert not target.exists()
+
+
+def test_runaway_queries_time_out(db, monkeypatch):
+    monkeypatch.setattr(sql_query, 'QUERY_TIMEOUT', 0.2)
+    started = time.monotonic()
+    with pytest.raises(QueryFailed, match="longer than"):
+        db.run("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT MAX(i) FROM n")
+    assert time.monotonic() - started < 2
+    # The connection is still usable afterwards
+    assert count(db, 'products') > 0
+
+
+@pytest.mark.parametrize('sql', [
+    "SELECT length(hex(randomblob(200000000)))",
+    "SELECT randomblob(16)",
+    "SELECT zeroblob(300000000)",
+    "SELECT printf('%0300000000d', 1)",
+    "SELECT format('%*d', 300000000, 1)",
+    "SELECT printf('%' || '300000000d', 1)",
+    "SELECT length(replace(hex(zeroblob(1000)), '0', hex(zeroblob(1000))))",
+    "WITH RECURSIVE s(x) AS (SELECT 'a' UNION ALL SELECT x || x FROM s) SELECT length(x) FROM s",
+    "SELECT group_concat(a.account || p.product || s.opportunity_id) FROM accounts a, products p, sales_pipeline s",
+])
+def test_huge_values_are_refused(db, sql):
+    started = time.monotonic()
+    with pytest.raises(QueryFailed):
+        db.run(sql)
+    assert time.monotonic() - started < 2
+    assert count(db, 'products') > 0
+
+
+def test_long_statements_are_refused(db):
+    with pytest.raises(QueryFailed):
+        db.run("SELECT " + " + ".join(["1"] * 20000))
+
+
+def test_small_formats_still_work(db):
+    assert db.run("SELECT printf('%.2f', 1.5), printf('%5d', 42), length(hex('ab'))")[1] == [('1.50', '   42', 4)]
+
+
+def test_result_cells_and_csv_are_capped(db, monkeypatch):
+    monkeypatch.setattr(sql_query, 'MAX_CELL_CHARS', 10)
+    monkeypatch.setattr(sql_query, 'MAX_RESULT_CHARS', 200)
+    _, rows, _ = db.run("SELECT group_concat(account) FROM accounts")
+    assert len(rows[0][0]) < 40 and rows[0][0].endswith("characters)")
+
+    results = results_as_csv(['blob'], [(b'\0' * 300000,)] * 1000, False)
+    assert len(results) < 400
+    assert "(only the first" in results
+
+
+def test_results_are_truncated(db, monkeypatch):
+    monkeypatch.setattr(sql_query, 'MAX_RESULT_ROWS', 5)
+    names, rows, truncated = db.run("SELECT * FROM sales_pipeline")
+    assert len(rows) == 5 and truncated
+
+
+def test_only_select_statements_are_extracted():
+    assert extract_sql("```sql\nSELECT 1;\n```") == "SELECT 1"
+    assert extract_sql("with x as (select 1) select * from x") == "with x as (select 1) select * from x"
+    with pytest.raises(QueryFailed):
+        extract_sql("```sql\nDELETE FROM accounts\n```")
@@ -0,0 +1,93 @@
+import collections
+import os
+import shutil
+
+import pytest
+
+import tenants
+from answer_cache import AnswerCache
+from conftest import BACKEND_DIR
+from dataset import local_answerer
+from sql_query import database
+from tenants import HashRing, TenantRegistry, UnknownTenant
+
+
+@pytest.fixture
+def tenants_dir(tmp_path):
+    for name in ('east', 'west'):
+        shutil.copytree(os.path.join(BACKEND_DIR, 'data'), tmp_path / name,
+                        ignore=shutil.ignore_patterns('.*', 'tenants'))
+    return tmp_path
+
+
+def test_unknown_and_invalid_tenants(tenants_dir):
+    registry = TenantRegistry(str(tenants_dir))
+    with pytest.raises(UnknownTenant):
+        registry.get('north')
+    with pytest.raises(UnknownTenant):
+        registry.get('../east')
+
+
+def test_memory_includes_derived_state(tenants_dir):
+    tenant = TenantRegistry(str(tenants_dir)).get('east')
+    raw = tenant.memory_bytes()
+    snapshot = tenant.snapshot()
+    local_answerer(snapshot)
+    with_answerer = tenant.memory_bytes()
+    database(snapshot)
+    assert raw < with_answerer < tenant.memory_bytes()
+
+
+def test_eviction_over_budget_drops_cached_answers(tenants_dir):
+    registry = TenantRegistry(str(tenants_dir), memory_budget_mb=0)
+    cache = AnswerCache()
+    registry.on_evict(cache.drop_tenant)
+
+    registry.get('east')
+    cache.put('east', 'v', 'prompt', "q", 1)
+    cache.put('west', 'v', 'prompt', "q", 2)
+    registry.get('west')
+
+    assert [t.id for t in registry.loaded()] == [tenants.DEFAULT_TENANT, 'west']
+    assert not cache.contains('east', 'v', 'prompt', "q")
+    assert cache.contains('west', 'v', 'prompt', "q")
+
+
+def test_idle_tenants_are_evicted(tenants_dir):
+    registry = TenantRegistry(str(tenants_dir), idle_seconds=0)
+    evicted = []
+    registry.on_evict(evicted.append)
+    registry.get('east')
+    registry.evict()
+    assert evicted == ['east']
+    # The default tenant is never evicted
+    assert [t.id for t in registry.loaded()] == [tenants.DEFAULT_TENANT]
+
+
+NODES = [f"http://node{i}:8080" for i in range(4)]
+TENANTS = [f"tenant-{i}" for i in range(2000)]
+
+
+def test_ring_spreads_tenants_evenly():
+    ring = HashRing(NODES)
+    counts = collections.Counter(ring.nodes_for(t)[0] for t in TENANTS)
+    assert set(counts) == set(NODES)
+    assert max(counts.values()) < 2 * len(TENANTS) / len(NODES)
+
+
+def test_adding_a_node_only_moves_its_share():
+    before = HashRing(NODES)
+    after = HashRing(NODES + ["http://node4:8080"])
+    moved = [t for t in TENANTS if before.nodes_for(t)[0] != after.nodes_for(t)[0]]
+    assert all(after.nodes_for(t)[0] == "http://node4:8080" for t in moved)
+    assert len(moved) < len(TENANTS) / 3
+
+
+def test_replicas_are_distinct_nodes():
+    ring = HashRing(NODES)
+    for tenant in TENANTS[:50]:
+        owners = ring.nodes_for(tenant, replicas=3)
+        assert len(owners) == len(set(owners)) == 3
+        assert owners[0] == ring.nodes_for(tenant)[0]
+    assert len(ring.nodes_for("x", replicas=10)) == len(NODES)
+    assert HashRing([]).nodes_for("x") == []
@@ -0,0 +1,36 @@
+import pytest
+
+from dataset import local_answerer
+from tiering import TierRouter, TIER_FULL, TIER_LOCAL
+
+
+@pytest.fixture(scope='module')
+def router():
+    return TierRouter()
+
+
+@pytest.mark.parametrize('question', [
+    "Which accounts bought GTX Basic?",
+    "What did Isdom purchase?",
+    "Which products does Darcel Schlecht sell?",
+])
+def test_pruned_context_keeps_the_pipeline(router, crm_snapshot, question):
+    decision = router.route(question, crm_snapshot)
+    assert decision.tier != TIER_LOCAL
+    # Either the whole dataset, or a subset that still links the entities to each other
+    assert decision.tables is None or 'sales_pipeline' in decision.tables
+
+
+def test_single_table_questions_stay_pruned(router, crm_snapshot):
+    entities = local_answerer(crm_snapshot).entities("What sectors are there?")
+    assert router.features("What sectors are there?", entities)['tables'] == ['accounts']
+
+
+def test_open_questions_go_to_the_full_model(router, crm_snapshot):
+    decision = router.route("Why are we losing deals in the medical sector and what should we change?", crm_snapshot)
+    assert decision.tier == TIER_FULL
+    assert decision.tables is None
+
+
+def test_faulty_local_answers_are_not_served(router, crm_snapshot):
+    assert router.route("How many deals are not won?", crm_snapshot).tier != TIER_LOCAL
@@ -0,0 +1,205 @@
+import collections
+import logging
+import os
+import re
+import threading
+import time
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from dataset import chat_prompt, local_answerer
+from llm import generate, DEFAULT_MODEL
+from scheduler import estimate_tokens, PRIORITY_INTERACTIVE
+
+logger = logging.getLogger(__name__)
+
+TIER_LOCAL = 'local'
+TIER_SMALL = 'small'
+TIER_FULL = 'full'
+
+TIERING_ENABLED = os.environ.get('MODEL_TIERING', '0') == '1'
+SMALL_MODEL = os.environ.get('TIER_SMALL_MODEL', 'gemini-2.0-flash-lite-001')
+FULL_MODEL = os.environ.get('TIER_FULL_MODEL', DEFAULT_MODEL)
+# Questions scoring below this go to the small model with a pruned context
+SMALL_THRESHOLD = float(os.environ.get('TIER_SMALL_THRESHOLD', 0.45))
+
+# USD per million input / output tokens, for the cost estimates in the stats
+MODEL_PRICES = {
+    'gemini-2.0-flash-001': (0.10, 0.40),
+    'gemini-2.0-flash-lite-001': (0.075, 0.30),
+}
+
+# Labelled examples the TF-IDF similarity is measured against
+SIMPLE_EXAMPLES = [
+    "What is the price of GTX Pro?",
+    "Who is the manager of Anna Snelling?",
+    "Which regional office does Zane Levy work in?",
+    "How many deals did Darcel Schlecht win?",
+    "What sector is Cheers in?",
+    "When was Codehow established?",
+    "List the products in the GTX series",
+    "How many employees does Zotware have?",
+    "What is the close value of deal 1C1I7A6R?",
+    "Which agents report to Cara Losch?",
+]
+COMPLEX_EXAMPLES = [
+    "Why are we losing deals in the medical sector and what should we change?",
+    "Compare the win rates of each regional office and explain the differences",
+    "Which sales agents perform best relative to their team and why?",
+    "What trends do you see in close values over time for each product series?",
+    "Summarize the pipeline health and give recommendations for next quarter",
+    "How does account revenue relate to deal size across sectors?",
+    "Which managers should get more resources based on their teams' performance?",
+    "Give me insights about our biggest opportunities and the risks around them",
+    "Rank the products by average deal value and explain what drives it",
+    "What patterns distinguish won deals from lost deals?",
+]
+
+COMPLEX_WORDS = re.compile(r'\b(why|how does|compare|comparison|trend|trends|insight|insights|explain|'
+                           r'recommend|recommendations|should|pattern|patterns|relate|correlat\w*|'
+                           r'analy[sz]e|analysis|summari[sz]e|risk|risks|predict|forecast|strategy)\b')
+AGGREGATE_WORDS = re.compile(r'\b(each|per|by|average|mean|median|rank|ranking|top|bottom|best|worst|'
+                             r'most|least|distribution|breakdown|rate|ratio|percentage|share)\b')
+
+# Words that tell us a table is needed, on top of the entities found in the question
+TABLE_WORDS = {
+    'sales_pipeline': re.compile(r'\b(deals?|opportunit\w*|pipeline|won|win|lost|los[es]|clos\w*|'
+                                 r'engag\w*|prospect\w*|sales?|sold|value)\b'),
+    'accounts': re.compile(r'\b(accounts?|sectors?|industr\w*|revenue|employees?|compan\w*|'
+                           r'customers?|clients?|subsidiar\w*|established|founded|located|location)\b'),
+    'products': re.compile(r'\b(products?|price|prices|priced|series|cost)\b'),
+    'sales_teams': re.compile(r'\b(agents?|reps?|managers?|teams?|office|regional|region|regions)\b'),
+}
+ENTITY_TABLES = {'products': 'products', 'agents': 'sales_teams', 'accounts': 'accounts', 'stages': 'sales_pipeline'}
+
+
+class Decision:
+    """Where a question was routed and why"""
+
+    def __init__(self, question, tier, model=None, tables=None, complexity=0.0, features=None, answer=None):
+        self.question = question
+        self.tier = tier
+        self.model = model
+        self.tables = tables
+        self.complexity = complexity
+        self.features = features or {}
+        self.answer = answer
+
+    def as_dict(self):
+        return {
+            'question': self.question,
+            'tier': self.tier,
+            'model': self.model,
+            'tables': self.tables,
+            'complexity': round(self.complexity, 3),
+            'features': self.features,
+        }
+
+
+class TierRouter:
+    """Routes chat questions to a local answer, a small model with a pruned context, or the full model"""
+
+    def __init__(self, small_threshold=SMALL_THRESHOLD):
+        self.small_threshold = small_threshold
+        self._vectorizer = TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True)
+        matrix = self._vectorizer.fit_transform(SIMPLE_EXAMPLES + COMPLEX_EXAMPLES)
+        self._simple = matrix[:len(SIMPLE_EXAMPLES)]
+        self._complex = matrix[len(SIMPLE_EXAMPLES):]
+        self._lock = threading.Lock()
+        self._tiers = {tier: {'count': 0, 'latency': collections.deque(maxlen=500), 'cost': 0.0}
+                       for tier in (TIER_LOCAL, TIER_SMALL, TIER_FULL)}
+        self._recent = collections.deque(maxlen=100)
+
+    def _tfidf_complexity(self, question):
+        vector = self._vectorizer.transform([question])
+        simple = cosine_similarity(vector, self._simple).max()
+        complex_ = cosine_similarity(vector, self._complex).max()
+        if simple + complex_ == 0:
+            return 0.5
+        return float(complex_ / (simple + complex_))
+
+    def features(self, question, entities):
+        q = question.lower()
+        tables = {ENTITY_TABLES[kind] for kind, found in entities.items() if found} | \
+            {table for table, words in TABLE_WORDS.items() if words.search(q)}
+        if len(tables) > 1 or any(entities.values()):
+            # The pipeline is the only table linking accounts, products and agents to each other
+            tables.add('sales_pipeline')
+        return {
+            'words': len(q.split()),
+            'entities': sum(len(found) for found in entities.values()),
+            'complex_words': len(COMPLEX_WORDS.findall(q)),
+            'aggregate_words': len(AGGREGATE_WORDS.findall(q)),
+            'tables': sorted(tables),
+            'tfidf': round(self._tfidf_complexity(question), 3),
+        }
+
+    def complexity(self, features):
+        """0 (simple lookup) .. 1 (open-ended analysis)"""
+        score = (0.35 * features['tfidf']
+                 + 0.25 * min(1.0, features['complex_words'] / 2)
+                 + 0.15 * min(1.0, features['aggregate_words'] / 2)
+                 + 0.10 * min(1.0, features['words'] / 30)
+                 + 0.15 * min(1.0, max(0, len(features['tables']) - 1) / 2))
+        return min(1.0, score)
+
+    def route(self, question, snapshot):
+        answerer = local_answerer(snapshot)
+        answer = answerer.answer(question)
+        if answer is not None:
+            return Decision(question, TIER_LOCAL, answer=answer)
+
+        features = self.features(question, answerer.entities(question))
+        complexity = self.complexity(features)
+        if complexity < self.small_threshold and features['tables']:
+            return Decision(question, TIER_SMALL, SMALL_MODEL, features['tables'], complexity, features)
+        return Decision(question, TIER_FULL, FULL_MODEL, None, complexity, features)
+
+    def record(self, decision, latency, prompt_tokens=0, output_tokens=0):
+        input_price, output_price = MODEL_PRICES.get(decision.model, (0.0, 0.0))
+        cost = (prompt_tokens * input_price + output_tokens * output_price) / 1e6
+        with self._lock:
+            tier = self._tiers[decision.tier]
+            tier['count'] += 1
+            tier['latency'].append(latency)
+            tier['cost'] += cost
+            self._recent.append(dict(decision.as_dict(), latency=round(latency, 3), cost=cost))
+
+    def stats(self):
+        with self._lock:
+            tiers = {}
+            for name, tier in self._tiers.items():
+                latencies = sorted(tier['latency'])
+                tiers[name] = {
+                    'count': tier['count'],
+                    'estimated_cost': round(tier['cost'], 6),
+                    'latency_p50': round(latencies[len(latencies) // 2], 3) if latencies else None,
+                    'latency_p95': round(latencies[int(len(latencies) * 0.95)], 3) if latencies else None,
+                }
+            return {
+                'enabled': TIERING_ENABLED,
+                'small_threshold': self.small_threshold,
+                'models': {TIER_SMALL: SMALL_MODEL, TIER_FULL: FULL_MODEL},
+                'tiers': tiers,
+                'recent': list(self._recent),
+            }
+
+
+router = TierRouter()
+
+
+def answer_tiered(user_question, snapshot, priority=PRIORITY_INTERACTIVE):
+    """Answer a chat question on the tier the router picks; returns (answer, decision)"""
+    decision = router.route(user_question, snapshot)
+    started = time.monotonic()
+    if decision.tier == TIER_LOCAL:
+        router.record(decision, time.monotonic() - started)
+        return decision.answer, decision
+
+    prompt = chat_prompt(user_question, snapshot, decision.tables)
+    answer = generate(prompt, model_name=decision.model, priority=priority)
+    router.record(decision, time.monotonic() - started,
+                  estimate_tokens(prompt, expected_output=0), estimate_tokens(answer, expected_output=0))
+    logger.debug(f"Answered on the {decision.tier} tier (complexity {decision.complexity:.2f})")
+    return answer, decision
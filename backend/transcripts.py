@@ -0,0 +1,84 @@
+import glob
+import json
+import logging
+import os
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+import snapshots
+
+logger = logging.getLogger(__name__)
+
+# Persistent FAISS index written by ingest_transcripts.py, one sub-directory per shard
+VECTOR_INDEX_DIR = os.environ.get('VECTOR_INDEX_DIR', os.path.join(snapshots.DATASET_DIR, 'vector_index'))
+SHARDS_DIR = 'shards'
+
+
+def formatTimestamp(seconds):
+    """Convert seconds to HH:MM:SS format"""
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    secs = int(seconds % 60)
+
+    # Only show HH:MM:SS if hours > 0, otherwise MM:SS
+    if hours > 0:
+        return f"{hours:02d}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+
+def text_splitter():
+    return RecursiveCharacterTextSplitter(
+        chunk_size=500,  # Reduced chunk size for more granular context
+        chunk_overlap=200,  # Increased overlap for better context preservation
+        separators=["\n\n", "\n", ".", "!", "?", ",", " ", ""],
+        length_function=len,
+    )
+
+
+def split_transcript(transcript, splitter=None, **metadata):
+    """Timestamped chunks of a transcript and their metadata; extra keyword arguments go into every chunk's metadata"""
+    # Enhance transcript context with timestamps and structure
+    full_text = "\n".join(f"[{formatTimestamp(entry['start'])}] {entry['text']}" for entry in transcript)
+    texts = (splitter or text_splitter()).split_text(full_text)
+
+    metadatas = []
+    for i, chunk in enumerate(texts):
+        # Find the closest transcript entry for timing info
+        start_time = 0
+        for entry in transcript:
+            if entry['text'] in chunk:
+                start_time = entry['start']
+                break
+
+        metadatas.append(dict({
+            'start': start_time,
+            'chunk_id': i,
+            'source': 'transcript'
+        }, **metadata))
+    return texts, metadatas
+
+
+def load_transcript(path):
+    """A transcript file: a JSON list of {"text", "start", "duration"} entries, or an object with a "transcript" list"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('transcript')
+    if not isinstance(data, list) or not all(isinstance(e, dict) and 'text' in e and 'start' in e for e in data):
+        raise ValueError(f"{path} is not a transcript")
+    return data
+
+
+def load_vector_index(embeddings, index_dir=VECTOR_INDEX_DIR):
+    """Merge every shard of the persistent index into one FAISS store; None when nothing has been ingested"""
+    from langchain_community.vectorstores import FAISS
+
+    index = None
+    for path in sorted(glob.glob(os.path.join(index_dir, SHARDS_DIR, '*', 'index.faiss'))):
+        # Shards are only written by our own ingestion command
+        shard = FAISS.load_local(os.path.dirname(path), embeddings, allow_dangerous_deserialization=True)
+        if index is None:
+            index = shard
+        else:
+            index.merge_from(shard)
+    return index